@@ -3,7 +3,8 @@
 # requires-python = ">=3.9"
 # dependencies = [
 #   "duckdb",
-#   "pandas",
+#   "numpy",
+#   "pyarrow",
 # ]
 # ///
 """
@@ -15,18 +16,38 @@ Creates realistic e-commerce transaction data in multiple formats:
 - JSON (semi-structured data)
 """
 
-import random
+import argparse
+import contextlib
+import glob
 import json
 import os
-from datetime import datetime, timedelta
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+import connections
+from schema import ENUMS
 
 # Ensure reproducibility
-random.seed(42)
+SEED = 42
 
-# Configuration
+# Configuration (table sizes at scale factor 1; --scale-factor multiplies all three)
 NUM_CUSTOMERS = 10_000
 NUM_PRODUCTS = 500
 NUM_TRANSACTIONS = 500_000
+CHUNK_SIZE = 250_000  # Transactions generated and written per batch
+JSON_SAMPLE_ROWS = 50_000
+SAMPLE_NAME = "transactions_sample"  # JSON copy of the first JSON_SAMPLE_ROWS transactions
+ROW_GROUP_SIZE = 122_880  # Rows per Parquet row group (DuckDB's own default)
+PARTITIONED_DATASET = "transactions"  # data/transactions/year=YYYY/month=M/part-N.parquet
+MANIFEST_FILE = "manifest.json"  # What has been generated so far, for --append-days
+SCHEMA_VERSION = 2  # 2: DATE/TIME columns instead of strings
 OUTPUT_DIR = "data"
 
 # Sample data pools
@@ -38,180 +59,620 @@ LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Mille
               "Davis", "Rodriguez", "Martinez", "Hernandez", "Lopez", "Gonzalez",
               "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin"]
 
-CATEGORIES = ["Electronics", "Clothing", "Home & Garden", "Sports", "Books",
-              "Toys", "Food & Beverages", "Health & Beauty", "Automotive", "Office"]
-
-REGIONS = ["North", "South", "East", "West", "Central"]
-STATES = ["CA", "TX", "FL", "NY", "PA", "IL", "OH", "GA", "NC", "MI",
-          "NJ", "VA", "WA", "AZ", "MA", "TN", "IN", "MO", "MD", "WI"]
-
-def generate_customers():
-    """Generate customer data."""
-    customers = []
-    for i in range(1, NUM_CUSTOMERS + 1):
-        customer = {
-            "customer_id": i,
-            "first_name": random.choice(FIRST_NAMES),
-            "last_name": random.choice(LAST_NAMES),
-            "email": f"customer{i}@example.com",
-            "region": random.choice(REGIONS),
-            "state": random.choice(STATES),
-            "signup_date": (datetime(2020, 1, 1) + timedelta(days=random.randint(0, 1500))).strftime("%Y-%m-%d"),
-            "loyalty_tier": random.choices(["Bronze", "Silver", "Gold", "Platinum"],
-                                          weights=[50, 30, 15, 5])[0]
-        }
-        customers.append(customer)
-    return customers
-
-def generate_products():
-    """Generate product catalog."""
-    products = []
-    adjectives = ["Premium", "Essential", "Pro", "Classic", "Ultra", "Compact", "Deluxe", "Basic"]
-    nouns = ["Widget", "Gadget", "Device", "Tool", "Item", "Product", "Gear", "Kit"]
-
-    for i in range(1, NUM_PRODUCTS + 1):
-        category = random.choice(CATEGORIES)
-        base_price = random.uniform(5, 500)
-        product = {
-            "product_id": i,
-            "product_name": f"{random.choice(adjectives)} {random.choice(nouns)} {i}",
-            "category": category,
-            "subcategory": f"{category} Sub-{random.randint(1, 5)}",
-            "base_price": round(base_price, 2),
-            "cost": round(base_price * random.uniform(0.3, 0.7), 2),
-            "weight_kg": round(random.uniform(0.1, 25), 2),
-            "is_active": random.random() > 0.1
-        }
-        products.append(product)
-    return products
-
-def generate_transactions(customers, products):
-    """Generate transaction data with realistic patterns."""
-    transactions = []
-    start_date = datetime(2023, 1, 1)
-
-    for i in range(1, NUM_TRANSACTIONS + 1):
-        customer = random.choice(customers)
-        product = random.choice(products)
-
-        # Add some seasonality - more transactions in Q4
-        day_offset = random.randint(0, 729)  # 2 years of data
-        trans_date = start_date + timedelta(days=day_offset)
-
-        # Q4 boost
-        if trans_date.month in [10, 11, 12]:
-            if random.random() > 0.3:  # 70% chance to keep Q4 transaction
-                pass
-
-        quantity = random.choices([1, 2, 3, 4, 5], weights=[50, 25, 15, 7, 3])[0]
-
-        # Apply random discount
-        discount_pct = random.choices([0, 5, 10, 15, 20, 25],
-                                      weights=[40, 25, 15, 10, 7, 3])[0]
-
-        unit_price = product["base_price"] * (1 - discount_pct / 100)
-        total_amount = round(unit_price * quantity, 2)
-
-        transaction = {
-            "transaction_id": i,
-            "customer_id": customer["customer_id"],
-            "product_id": product["product_id"],
-            "transaction_date": trans_date.strftime("%Y-%m-%d"),
-            "transaction_time": f"{random.randint(0,23):02d}:{random.randint(0,59):02d}:{random.randint(0,59):02d}",
-            "quantity": quantity,
-            "unit_price": round(unit_price, 2),
-            "discount_percent": discount_pct,
-            "total_amount": total_amount,
-            "payment_method": random.choice(["Credit Card", "Debit Card", "PayPal", "Bank Transfer"]),
-            "channel": random.choices(["Web", "Mobile", "In-Store"], weights=[50, 35, 15])[0]
-        }
-        transactions.append(transaction)
-
-    return transactions
-
-def save_csv(data, filename):
-    """Save data as CSV."""
-    if not data:
-        return
-
-    filepath = os.path.join(OUTPUT_DIR, filename)
-    with open(filepath, 'w') as f:
-        # Header
-        f.write(','.join(data[0].keys()) + '\n')
-        # Data
-        for row in data:
-            values = [str(v).replace(',', ';') for v in row.values()]
-            f.write(','.join(values) + '\n')
-
-    print(f"  Saved {filepath} ({len(data):,} rows)")
-
-def save_parquet(data, filename):
-    """Save data as Parquet using DuckDB."""
-    import duckdb
-    import pandas as pd
-
-    filepath = os.path.join(OUTPUT_DIR, filename)
-
-    # Convert to pandas DataFrame first, then use DuckDB to save as Parquet
-    df = pd.DataFrame(data)
-    conn = duckdb.connect()
-    conn.execute(f"COPY (SELECT * FROM df) TO '{filepath}' (FORMAT PARQUET, COMPRESSION ZSTD)")
-    conn.close()
-
-    print(f"  Saved {filepath} ({len(data):,} rows)")
-
-def save_json(data, filename):
-    """Save data as newline-delimited JSON."""
-    filepath = os.path.join(OUTPUT_DIR, filename)
-    with open(filepath, 'w') as f:
-        for row in data:
-            f.write(json.dumps(row) + '\n')
-
-    print(f"  Saved {filepath} ({len(data):,} rows)")
+PRODUCT_ADJECTIVES = ["Premium", "Essential", "Pro", "Classic", "Ultra", "Compact", "Deluxe", "Basic"]
+PRODUCT_NOUNS = ["Widget", "Gadget", "Device", "Tool", "Item", "Product", "Gear", "Kit"]
+
+# Weighted distributions as (values, weights)
+QUANTITIES = ([1, 2, 3, 4, 5], [50, 25, 15, 7, 3])
+DISCOUNTS = ([0, 5, 10, 15, 20, 25], [40, 25, 15, 10, 7, 3])
+
+# Relative frequencies of the weighted low-cardinality columns' values
+LOYALTY_TIER_WEIGHTS = {"Bronze": 50, "Silver": 30, "Gold": 15, "Platinum": 5}
+PAYMENT_METHOD_WEIGHTS = {"Credit Card": 1, "Debit Card": 1, "PayPal": 1, "Bank Transfer": 1}
+CHANNEL_WEIGHTS = {"Web": 50, "Mobile": 35, "In-Store": 15}
+
+SIGNUP_START = np.datetime64("2020-01-01")
+SIGNUP_DAYS = 1501
+TRANSACTION_START = np.datetime64("2023-01-01")
+TRANSACTION_DAYS = 730  # 2 years of data
+
+# Arrow types for columns numpy has no dtype for; dates are datetime64[D]
+ARROW_TYPES = {
+    "transaction_time": pa.time32("s"),  # Seconds since midnight -> TIME
+}
+
+# Low-cardinality columns are generated as int8 codes into these dictionaries
+DICTIONARIES = {column: pa.array(values) for column, values in ENUMS.items()}
+
+def string_pool(values):
+    """Build an object array of strings so columns can share them by index."""
+    values = list(values)
+    pool = np.empty(len(values), dtype=object)
+    pool[:] = values
+    return pool
+
+def weighted_choice(rng, distribution, size):
+    """Draw `size` values from a (values, weights) distribution."""
+    values, weights = distribution
+    p = np.asarray(weights, dtype=np.float64)
+    return rng.choice(np.asarray(values), size=size, p=p / p.sum())
+
+def enum_codes(rng, column, size, weights=None):
+    """Draw `size` int8 codes into a schema.ENUMS column, uniformly unless `weights` maps values to weights."""
+    values = ENUMS[column]
+    if weights is None:
+        return rng.integers(0, len(values), size).astype(np.int8)
+    p = np.asarray([weights[value] for value in values], dtype=np.float64)
+    return rng.choice(len(values), size=size, p=p / p.sum()).astype(np.int8)
+
+def num_rows(table):
+    """Number of rows in a column-oriented table."""
+    return len(next(iter(table.values())))
+
+def head(table, n):
+    """First `n` rows of a column-oriented table."""
+    return {name: column[:n] for name, column in table.items()}
+
+def generate_customers(rng, num_customers=NUM_CUSTOMERS):
+    """Generate customer data as a dict of column arrays."""
+    n = num_customers
+    customer_id = np.arange(1, n + 1, dtype=np.int64)
+    return {
+        "customer_id": customer_id,
+        "first_name": string_pool(FIRST_NAMES)[rng.integers(0, len(FIRST_NAMES), n)],
+        "last_name": string_pool(LAST_NAMES)[rng.integers(0, len(LAST_NAMES), n)],
+        "email": string_pool(f"customer{i}@example.com" for i in customer_id.tolist()),
+        "region": enum_codes(rng, "region", n),
+        "state": enum_codes(rng, "state", n),
+        "signup_date": SIGNUP_START + rng.integers(0, SIGNUP_DAYS, n),
+        "loyalty_tier": enum_codes(rng, "loyalty_tier", n, LOYALTY_TIER_WEIGHTS),
+    }
+
+def generate_products(rng, num_products=NUM_PRODUCTS):
+    """Generate product catalog as a dict of column arrays."""
+    n = num_products
+    product_id = np.arange(1, n + 1, dtype=np.int64)
+    category = enum_codes(rng, "category", n)
+    base_price = rng.uniform(5, 500, n)
+    adjective = string_pool(PRODUCT_ADJECTIVES)[rng.integers(0, len(PRODUCT_ADJECTIVES), n)]
+    noun = string_pool(PRODUCT_NOUNS)[rng.integers(0, len(PRODUCT_NOUNS), n)]
+    sub = rng.integers(1, 6, n)
+    return {
+        "product_id": product_id,
+        "product_name": adjective + " " + noun + " " + product_id.astype(str).astype(object),
+        "category": category,
+        "subcategory": string_pool(ENUMS["category"])[category] + " Sub-" + sub.astype(str).astype(object),
+        "base_price": np.round(base_price, 2),
+        "cost": np.round(base_price * rng.uniform(0.3, 0.7, n), 2),
+        "weight_kg": np.round(rng.uniform(0.1, 25, n), 2),
+        "is_active": rng.random(n) > 0.1,
+    }
+
+def generate_transactions(customers, products, rng, num_transactions=NUM_TRANSACTIONS, first_id=1,
+                          start_date=TRANSACTION_START, num_days=TRANSACTION_DAYS):
+    """Generate transaction data with realistic patterns, one column at a time."""
+    n = num_transactions
+    customer_idx = rng.integers(0, num_rows(customers), n)
+    product_idx = rng.integers(0, num_rows(products), n)
+    day_offset = rng.integers(0, num_days, n)
+    seconds = rng.integers(0, 86_400, n)
+
+    quantity = weighted_choice(rng, QUANTITIES, n)
+
+    # Apply random discount
+    discount_pct = weighted_choice(rng, DISCOUNTS, n)
+
+    unit_price = products["base_price"][product_idx] * (1 - discount_pct / 100)
+    total_amount = np.round(unit_price * quantity, 2)
+
+    return {
+        "transaction_id": np.arange(first_id, first_id + n, dtype=np.int64),
+        "customer_id": customers["customer_id"][customer_idx],
+        "product_id": products["product_id"][product_idx],
+        "transaction_date": start_date + day_offset,
+        "transaction_time": seconds.astype(np.int32),
+        "quantity": quantity,
+        "unit_price": np.round(unit_price, 2),
+        "discount_percent": discount_pct,
+        "total_amount": total_amount,
+        "payment_method": enum_codes(rng, "payment_method", n, PAYMENT_METHOD_WEIGHTS),
+        "channel": enum_codes(rng, "channel", n, CHANNEL_WEIGHTS),
+    }
+
+def iter_transactions(customers, products, rng, num_transactions=NUM_TRANSACTIONS,
+                      chunk_size=CHUNK_SIZE, first_id=1, start_date=TRANSACTION_START,
+                      num_days=TRANSACTION_DAYS):
+    """Yield transactions in chunks of at most `chunk_size` rows."""
+    end_id = first_id + num_transactions
+    for chunk_start in range(first_id, end_id, chunk_size):
+        n = min(chunk_size, end_id - chunk_start)
+        yield generate_transactions(customers, products, rng, n, chunk_start, start_date, num_days)
+
+def derive_seed(seed, stream):
+    """Independent, reproducible seed for one stream (0 = dimensions, 1+ = shards).
+
+    Appended batches continue numbering after the streams already used, so
+    every shard ever generated for a seed draws from its own stream.
+    """
+    return np.random.SeedSequence(seed, spawn_key=(stream,))
+
+def scaled_sizes(scale_factor):
+    """Row counts for every table at a scale factor, keeping SF 1's ratios between them."""
+    return {
+        "num_customers": max(1, round(NUM_CUSTOMERS * scale_factor)),
+        "num_products": max(1, round(NUM_PRODUCTS * scale_factor)),
+        "num_transactions": max(1, round(NUM_TRANSACTIONS * scale_factor)),
+    }
+
+def generate_dimensions(seed, num_customers=NUM_CUSTOMERS, num_products=NUM_PRODUCTS):
+    """Generate the customer and product tables for a seed."""
+    rng = np.random.default_rng(derive_seed(seed, 0))
+    return generate_customers(rng, num_customers), generate_products(rng, num_products)
+
+def shard_filename(name, ext, shard, num_shards):
+    """File name for one shard; a single shard keeps the plain name."""
+    if num_shards == 1:
+        return f"{name}.{ext}"
+    return f"{name}-{shard:05d}-of-{num_shards:05d}.{ext}"
+
+def clear_transaction_outputs():
+    """Remove transaction files and the manifest left over from a previous run."""
+    for filepath in glob.glob(os.path.join(OUTPUT_DIR, "transactions*.*")):
+        os.remove(filepath)
+    shutil.rmtree(os.path.join(OUTPUT_DIR, PARTITIONED_DATASET), ignore_errors=True)
+    if os.path.exists(os.path.join(OUTPUT_DIR, MANIFEST_FILE)):
+        os.remove(os.path.join(OUTPUT_DIR, MANIFEST_FILE))
+
+def load_manifest():
+    """Read the manifest written by the last run, or None if there is none."""
+    filepath = os.path.join(OUTPUT_DIR, MANIFEST_FILE)
+    if not os.path.exists(filepath):
+        return None
+    with open(filepath) as f:
+        return json.load(f)
+
+def save_manifest(manifest):
+    """Atomically replace the manifest so an interrupted run never leaves it half-written."""
+    filepath = os.path.join(OUTPUT_DIR, MANIFEST_FILE)
+    with open(filepath + ".tmp", 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(filepath + ".tmp", filepath)
+
+def new_manifest(seed, scale_factor=1.0):
+    """Empty manifest for a full generation run at a scale factor."""
+    return {
+        "schema_version": SCHEMA_VERSION,
+        "seed": seed,
+        "scale_factor": scale_factor,
+        **scaled_sizes(scale_factor),
+        "next_stream": 1,
+        "last_transaction_id": 0,
+        "start_date": None,
+        "end_date": None,
+        "batches": [],
+    }
+
+def plan_batch(manifest, num_transactions, start_date, num_days, workers, cluster_by=()):
+    """Describe the next batch of transactions; the record alone is enough to regenerate it."""
+    return {
+        "batch": len(manifest["batches"]),
+        "first_stream": manifest["next_stream"],
+        "workers": workers,
+        "first_transaction_id": manifest["last_transaction_id"] + 1,
+        "num_transactions": num_transactions,
+        "start_date": str(start_date),
+        "num_days": num_days,
+        "cluster_by": list(cluster_by),
+    }
+
+def record_batch(manifest, batch, files):
+    """Add a written batch to the manifest and advance its cursors."""
+    batch = dict(batch, files=sorted(files))
+    end_date = np.datetime64(batch["start_date"]) + batch["num_days"] - 1
+    manifest["batches"].append(batch)
+    manifest["next_stream"] = batch["first_stream"] + batch["workers"]
+    manifest["last_transaction_id"] = batch["first_transaction_id"] + batch["num_transactions"] - 1
+    manifest["start_date"] = manifest["start_date"] or batch["start_date"]
+    manifest["end_date"] = str(end_date)
+
+def path_size(path):
+    """Size of a file, or of every file below a directory."""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(path) for name in names)
+
+def to_arrow(name, column):
+    """Convert one generated column to an Arrow array."""
+    if name in DICTIONARIES:
+        return pa.DictionaryArray.from_arrays(pa.array(column), DICTIONARIES[name])
+    return pa.array(column, type=ARROW_TYPES.get(name))
+
+def to_record_batch(table):
+    """Wrap a column-oriented table as an Arrow record batch.
+
+    Numeric and datetime64[D] (-> DATE) columns are handed to Arrow without
+    copying, and low-cardinality columns become dictionary arrays over their
+    int8 codes. Other string columns are encoded once straight from the pooled
+    Python strings.
+    """
+    return pa.RecordBatch.from_arrays([to_arrow(name, column) for name, column in table.items()],
+                                      names=list(table))
+
+class TableWriter:
+    """Base class for writers that append column-oriented chunks to one file."""
+
+    def __init__(self, filename, max_rows=None):
+        self.filepath = os.path.join(OUTPUT_DIR, filename)
+        self.max_rows = max_rows
+        self.rows = 0
+
+    def write(self, table):
+        """Append a chunk, truncated so the file never exceeds `max_rows`."""
+        if self.max_rows is not None:
+            table = head(table, self.max_rows - self.rows)
+        n = num_rows(table)
+        if n:
+            self._write(table)
+            self.rows += n
+
+    def close(self):
+        self._close()
+        print(f"  Saved {self.filepath} ({self.rows:,} rows)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class CsvWriter(TableWriter):
+    """Append chunks to a CSV file, serializing each chunk in one Arrow call.
+
+    String values are quoted, so commas inside them survive a round trip.
+    """
+
+    def __init__(self, filename, max_rows=None):
+        super().__init__(filename, max_rows)
+        self.file = open(self.filepath, 'wb')
+        self.writer = None
+
+    def _write(self, table):
+        batch = to_record_batch(table)
+        if self.writer is None:
+            self.writer = pa_csv.CSVWriter(self.file, batch.schema)
+        self.writer.write_batch(batch)
+
+    def _close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.file.close()
+
+class ParquetWriter(TableWriter):
+    """Append chunks to a ZSTD-compressed Parquet file in fixed-size row groups.
+
+    With `cluster_by`, the finished file is rewritten sorted by those columns
+    (see cluster_parquet), so row-group min/max statistics become selective.
+    """
+
+    def __init__(self, filename, max_rows=None, row_group_size=ROW_GROUP_SIZE, cluster_by=()):
+        super().__init__(filename, max_rows)
+        self.row_group_size = row_group_size
+        self.cluster_by = cluster_by
+        self.writer = None
+        self.pending = []
+        self.pending_rows = 0
+
+    def _write(self, table):
+        batch = to_record_batch(table)
+        self.pending.append(batch)
+        self.pending_rows += batch.num_rows
+        if self.pending_rows >= self.row_group_size:
+            self._flush()
+
+    def _flush(self, final=False):
+        """Write buffered rows as full row groups, keeping the remainder unless `final`."""
+        buffered = pa.Table.from_batches(self.pending)
+        ready = buffered.num_rows if final else buffered.num_rows - buffered.num_rows % self.row_group_size
+        if ready:
+            if self.writer is None:
+                os.makedirs(os.path.dirname(self.filepath), exist_ok=True)
+                self.writer = pq.ParquetWriter(self.filepath, buffered.schema, compression="zstd")
+            self.writer.write_table(buffered.slice(0, ready), row_group_size=self.row_group_size)
+        remainder = buffered.slice(ready)
+        self.pending = remainder.to_batches()
+        self.pending_rows = remainder.num_rows
+
+    def _close(self):
+        if self.pending:
+            self._flush(final=True)
+        if self.writer is not None:
+            self.writer.close()
+            if self.cluster_by:
+                cluster_parquet(self.filepath, self.cluster_by, self.row_group_size)
+
+def cluster_parquet(filepath, cluster_by, row_group_size=ROW_GROUP_SIZE):
+    """Rewrite a transactions Parquet file sorted by the `cluster_by` columns.
+
+    DuckDB does the sort, spilling to disk if the file doesn't fit in memory,
+    and transaction_id breaks ties so the output stays reproducible. Batches
+    are cast back to the file's original schema and written in row groups of
+    exactly `row_group_size` rows.
+    """
+    schema = pq.read_schema(filepath)
+    order = ", ".join([*cluster_by, "transaction_id"])
+    conn = connections.connect()
+    try:
+        sql = f"SELECT * FROM read_parquet(?, hive_partitioning = false) ORDER BY {order}"
+        reader = conn.execute(sql, [filepath]).to_arrow_reader(row_group_size)
+        with pq.ParquetWriter(filepath + ".tmp", schema, compression="zstd") as writer:
+            for batch in reader:
+                writer.write_table(pa.Table.from_batches([batch]).cast(schema),
+                                   row_group_size=row_group_size)
+    finally:
+        conn.close()
+    os.replace(filepath + ".tmp", filepath)
+
+class PartitionedParquetWriter(TableWriter):
+    """Split transaction chunks by month into a Hive-style year=/month= Parquet layout."""
+
+    def __init__(self, dataset, part_name="part-00000", row_group_size=ROW_GROUP_SIZE, cluster_by=()):
+        super().__init__(dataset)
+        self.dataset = dataset
+        self.part_name = part_name
+        self.row_group_size = row_group_size
+        self.cluster_by = cluster_by
+        self.partitions = {}
+
+    def _write(self, table):
+        # Months since 1970-01, grouped with a stable sort so rows keep their id order
+        months = table["transaction_date"].astype("datetime64[M]").astype(np.int64)
+        order = np.argsort(months, kind="stable")
+        keys, starts = np.unique(months[order], return_index=True)
+        for key, rows in zip(keys.tolist(), np.split(order, starts[1:])):
+            if key not in self.partitions:
+                year, month = divmod(key, 12)
+                filename = os.path.join(self.dataset, f"year={1970 + year}", f"month={month + 1}",
+                                        f"{self.part_name}.parquet")
+                self.partitions[key] = ParquetWriter(filename, row_group_size=self.row_group_size,
+                                                     cluster_by=self.cluster_by)
+            self.partitions[key].write({name: column[rows] for name, column in table.items()})
+
+    def _close(self):
+        for writer in self.partitions.values():
+            writer._close()
+
+    def close(self):
+        self._close()
+        print(f"  Saved {self.filepath}/ ({self.rows:,} rows in {len(self.partitions)} partitions)")
+
+class JsonWriter(TableWriter):
+    """Append chunks to a newline-delimited JSON file.
+
+    DuckDB renders a whole chunk to JSON strings at once, and the resulting
+    Arrow string buffer is written to the file as a single block.
+    """
+
+    def __init__(self, filename, max_rows=None):
+        super().__init__(filename, max_rows)
+        self.file = open(self.filepath, 'wb')
+        self.conn = connections.connect()
+
+    def _write(self, table):
+        chunk = to_record_batch(table)
+        self.conn.register("chunk", chunk)
+        rendered = self.conn.execute("SELECT to_json(chunk)::VARCHAR FROM chunk").to_arrow_table()
+        self.conn.unregister("chunk")
+        lines = pc.binary_join_element_wise(rendered.column(0), "\n", "").combine_chunks()
+        lines = lines.cast(pa.large_string())
+        _, offsets, data = lines.buffers()
+        offsets = np.frombuffer(offsets, dtype=np.int64)[lines.offset:lines.offset + len(lines) + 1]
+        self.file.write(data[offsets[0]:offsets[-1]])
+
+    def _close(self):
+        self.conn.close()
+        self.file.close()
+
+def save_table(table, name):
+    """Save a small, fully generated table in every format."""
+    for writer in (CsvWriter(f"{name}.csv"), ParquetWriter(f"{name}.parquet"),
+                   JsonWriter(f"{name}.json")):
+        with writer:
+            writer.write(table)
+
+def write_shard(manifest, batch, shard, row_group_size=ROW_GROUP_SIZE):
+    """Generate one shard of a transaction batch and save it to its own files.
+
+    Returns the written paths, relative to OUTPUT_DIR.
+    """
+    seed = manifest["seed"]
+    customers, products = generate_dimensions(seed, manifest["num_customers"],
+                                              manifest["num_products"])
+    rng = np.random.default_rng(derive_seed(seed, batch["first_stream"] + shard))
+    num_shards = batch["workers"]
+    total = batch["num_transactions"]
+    first_id = batch["first_transaction_id"] + total * shard // num_shards
+    num_rows_in_shard = total * (shard + 1) // num_shards - total * shard // num_shards
+
+    # The first batch keeps the plain names; appended ones are tagged with their number
+    name = "transactions" if batch["batch"] == 0 else f"transactions-append-{batch['batch']:05d}"
+    part_name = f"part-{shard:05d}" if batch["batch"] == 0 else f"append-{batch['batch']:05d}-part-{shard:05d}"
+
+    with contextlib.ExitStack() as stack:
+        writers = [
+            stack.enter_context(CsvWriter(shard_filename(name, "csv", shard, num_shards))),
+            stack.enter_context(ParquetWriter(shard_filename(name, "parquet", shard, num_shards),
+                                              row_group_size=row_group_size,
+                                              cluster_by=batch["cluster_by"])),
+        ]
+        partitioned = stack.enter_context(
+            PartitionedParquetWriter(PARTITIONED_DATASET, part_name, row_group_size,
+                                     batch["cluster_by"]))
+        writers.append(partitioned)
+        # Only save the first JSON_SAMPLE_ROWS transactions as JSON (it's verbose); each
+        # shard writes its share of them and write_batch() joins the parts
+        sample_rows = min(num_rows_in_shard,
+                          JSON_SAMPLE_ROWS - (first_id - batch["first_transaction_id"]))
+        if batch["batch"] == 0 and sample_rows > 0:
+            writers.append(stack.enter_context(
+                JsonWriter(shard_filename(SAMPLE_NAME, "json", shard, num_shards),
+                           max_rows=sample_rows)))
+
+        for chunk in iter_transactions(customers, products, rng, num_rows_in_shard,
+                                       first_id=first_id,
+                                       start_date=np.datetime64(batch["start_date"]),
+                                       num_days=batch["num_days"]):
+            for writer in writers:
+                writer.write(chunk)
+
+    writers.remove(partitioned)
+    writers.extend(partitioned.partitions.values())
+    return [os.path.relpath(writer.filepath, OUTPUT_DIR) for writer in writers if writer.rows]
+
+def join_sample_parts(files):
+    """Concatenate the shards' JSON sample parts, in shard order, into one sample file.
+
+    Returns `files` with the parts replaced by the joined file.
+    """
+    parts = [path for path in files if path.startswith(f"{SAMPLE_NAME}-")]
+    if not parts:
+        return files
+    with open(os.path.join(OUTPUT_DIR, f"{SAMPLE_NAME}.json"), "wb") as out:
+        for part in parts:
+            with open(os.path.join(OUTPUT_DIR, part), "rb") as f:
+                shutil.copyfileobj(f, out)
+            os.remove(os.path.join(OUTPUT_DIR, part))
+    return [path for path in files if path not in parts] + [f"{SAMPLE_NAME}.json"]
+
+def write_batch(manifest, batch, row_group_size=ROW_GROUP_SIZE):
+    """Write every shard of a batch, in parallel when it has more than one."""
+    if batch["workers"] == 1:
+        return write_shard(manifest, batch, 0, row_group_size)
+    files = []
+    with ProcessPoolExecutor(max_workers=batch["workers"]) as pool:
+        shards = [pool.submit(write_shard, manifest, batch, shard, row_group_size)
+                  for shard in range(batch["workers"])]
+        for future in shards:
+            files.extend(future.result())
+    return join_sample_parts(files)
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="split transactions into N shards generated by N processes")
+    parser.add_argument("--seed", type=int,
+                        help=f"random seed (default: {SEED}; appends use the manifest's)")
+    parser.add_argument("--scale-factor", type=float, metavar="SF",
+                        help="multiply every table size by SF (1 = 10K customers, 500 products, "
+                             "500K transactions; appends use the manifest's)")
+    parser.add_argument("--row-group-size", type=int, default=ROW_GROUP_SIZE,
+                        help=f"rows per Parquet row group (default: {ROW_GROUP_SIZE:,})")
+    parser.add_argument("--cluster-by", type=lambda value: value.split(","), metavar="COLS",
+                        help="sort each transactions Parquet file by these comma-separated "
+                             "columns (e.g. transaction_date,customer_id) so min/max statistics "
+                             "let filters skip row groups; appends reuse the previous batch's "
+                             "setting unless given")
+    parser.add_argument("--append-days", type=int, metavar="N",
+                        help="append N more days of transactions after the ones recorded in "
+                             f"{OUTPUT_DIR}/{MANIFEST_FILE}, leaving existing files untouched")
+    args = parser.parse_args()
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.scale_factor is not None and args.scale_factor <= 0:
+        parser.error("--scale-factor must be greater than 0")
+    if args.append_days is not None and args.append_days < 1:
+        parser.error("--append-days must be at least 1")
+    if args.append_days is not None:
+        # Appended days continue the recorded dataset, so they can't change its seed or size
+        manifest = load_manifest()
+        if manifest is not None:
+            for option, name in (("--seed", "seed"), ("--scale-factor", "scale_factor")):
+                value = getattr(args, name)
+                if value is not None and value != manifest[name]:
+                    parser.error(f"{option} {value:g} does not match the {manifest[name]:g} "
+                                 f"recorded in {OUTPUT_DIR}/{MANIFEST_FILE}")
+    if args.seed is None:
+        args.seed = SEED
+    if args.scale_factor is None:
+        args.scale_factor = 1.0
+    return args
+
+def transaction_columns():
+    """Names of the transaction columns, from a one-row sample."""
+    customers, products = generate_dimensions(SEED, 1, 1)
+    return list(generate_transactions(customers, products, np.random.default_rng(SEED), 1))
 
 def main():
     """Generate all datasets."""
+    args = parse_args()
     os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-    print("Generating sample data for DuckDB exploration...")
-    print(f"  Customers: {NUM_CUSTOMERS:,}")
-    print(f"  Products: {NUM_PRODUCTS:,}")
-    print(f"  Transactions: {NUM_TRANSACTIONS:,}")
-    print()
-
-    print("Generating customers...")
-    customers = generate_customers()
-
-    print("Generating products...")
-    products = generate_products()
-
-    print("Generating transactions...")
-    transactions = generate_transactions(customers, products)
-
-    print("\nSaving files...")
-
-    # Save in multiple formats
-    print("\nCSV format:")
-    save_csv(customers, "customers.csv")
-    save_csv(products, "products.csv")
-    save_csv(transactions, "transactions.csv")
-
-    print("\nParquet format:")
-    save_parquet(customers, "customers.parquet")
-    save_parquet(products, "products.parquet")
-    save_parquet(transactions, "transactions.parquet")
-
-    print("\nJSON format (newline-delimited):")
-    save_json(customers, "customers.json")
-    save_json(products, "products.json")
-    # Only save subset of transactions as JSON (it's verbose)
-    save_json(transactions[:50000], "transactions_sample.json")
+    unknown = set(args.cluster_by or []) - set(transaction_columns())
+    if unknown:
+        raise SystemExit(f"Unknown --cluster-by columns: {', '.join(sorted(unknown))}")
+
+    if args.append_days is not None:
+        manifest = load_manifest()
+        if manifest is None:
+            raise SystemExit(f"No {OUTPUT_DIR}/{MANIFEST_FILE} found; run a full generation first.")
+        if manifest.get("schema_version", 1) != SCHEMA_VERSION:
+            raise SystemExit(f"{OUTPUT_DIR}/{MANIFEST_FILE} was written with an older schema; "
+                             "run a full generation first so appended files match.")
+        # Keep the daily transaction rate of the original dataset
+        num_transactions = round(args.append_days * manifest["num_transactions"] / TRANSACTION_DAYS)
+        start_date = np.datetime64(manifest["end_date"]) + 1
+        cluster_by = args.cluster_by
+        if cluster_by is None:
+            cluster_by = manifest["batches"][-1].get("cluster_by", [])
+        batch = plan_batch(manifest, num_transactions, start_date, args.append_days, args.workers,
+                           cluster_by)
+        print(f"Appending {num_transactions:,} transactions for {args.append_days} days "
+              f"from {start_date} (batch {batch['batch']}, seed {manifest['seed']})...")
+    else:
+        manifest = new_manifest(args.seed, args.scale_factor)
+        batch = plan_batch(manifest, manifest["num_transactions"], TRANSACTION_START,
+                           TRANSACTION_DAYS, args.workers, args.cluster_by or [])
+
+        print("Generating sample data for DuckDB exploration...")
+        print(f"  Scale factor: {args.scale_factor:g}")
+        print(f"  Customers: {manifest['num_customers']:,}")
+        print(f"  Products: {manifest['num_products']:,}")
+        print(f"  Transactions: {manifest['num_transactions']:,}")
+        print(f"  Seed: {args.seed}, workers: {args.workers}")
+        if batch["cluster_by"]:
+            print(f"  Parquet clustered by: {', '.join(batch['cluster_by'])}")
+        print()
+
+        print("Generating customers and products...")
+        customers, products = generate_dimensions(args.seed, manifest["num_customers"],
+                                                  manifest["num_products"])
+
+        print("\nSaving customers and products...")
+        save_table(customers, "customers")
+        save_table(products, "products")
+        clear_transaction_outputs()
+
+    # Each shard streams its transactions to disk chunk by chunk so memory stays flat
+    print(f"\nGenerating and saving transactions ({CHUNK_SIZE:,} rows per chunk)...")
+    start = time.perf_counter()
+    files = write_batch(manifest, batch, args.row_group_size)
+    elapsed = time.perf_counter() - start
+    print(f"  {batch['num_transactions']:,} transactions in {elapsed:.2f}s "
+          f"({batch['num_transactions'] / elapsed:,.0f} rows/sec)")
+
+    record_batch(manifest, batch, files)
+    save_manifest(manifest)
+    print(f"  Manifest: transactions 1-{manifest['last_transaction_id']:,}, "
+          f"{manifest['start_date']} to {manifest['end_date']}")
 
     # Get file sizes
     print("\nFile sizes:")
     for filename in sorted(os.listdir(OUTPUT_DIR)):
         filepath = os.path.join(OUTPUT_DIR, filename)
-        size = os.path.getsize(filepath)
+        size = path_size(filepath)
         if size > 1024 * 1024:
             print(f"  {filename}: {size / (1024*1024):.2f} MB")
         else:
@@ -3,6 +3,7 @@
 # requires-python = ">=3.9"
 # dependencies = [
 #   "duckdb",
+#   "pyarrow",
 # ]
 # ///
 """
@@ -12,10 +13,66 @@ One of DuckDB's killer features is querying CSV, Parquet, and JSON files
 directly using SQL - no need to load data into a database first!
 """
 
-import duckdb
+import os
 import time
 
-def demo_csv_queries():
+import connections
+import result_cache
+from benchmark import RESULTS_DIR, print_results, run_benchmark, write_results
+from csv_schemas import CsvSchemaRegistry
+from metrics import QueryMetrics
+from parquet_shadows import ParquetShadowCache
+from queries import QUERIES
+from result_cache import ResultCache
+
+# Latency, rows and bytes read of every demo query, written out by main()
+query_metrics = QueryMetrics()
+# Dialects and column types of the CSV files, sniffed once per file version
+csv_schemas = CsvSchemaRegistry()
+# Parquet copies of the CSV/JSON files, made the first time a query reads them
+shadow_cache = ParquetShadowCache(csv_schemas=csv_schemas)
+
+def row_groups_skipped(conn, files, column, sql_type, low=None, high=None):
+    """Count row groups whose min/max statistics rule out `low <= column <= high`.
+
+    Reads only the footers via parquet_metadata(); returns (skipped, total).
+    """
+    ruled_out, bounds = [], []
+    if low is not None:
+        ruled_out.append(f"stats_max_value::{sql_type} < ?::{sql_type}")
+        bounds.append(low)
+    if high is not None:
+        ruled_out.append(f"stats_min_value::{sql_type} > ?::{sql_type}")
+        bounds.append(high)
+    return conn.execute(f"""
+        SELECT COUNT(*) FILTER (WHERE {" OR ".join(ruled_out)}), COUNT(*)
+        FROM parquet_metadata(?)
+        WHERE path_in_schema = ?
+    """, [*bounds, files, column]).fetchone()
+
+def print_pruning(conn, name):
+    """Print how many row groups a demo query's range filter lets DuckDB skip."""
+    where = QUERIES[name].range_filter
+    skipped, total = row_groups_skipped(conn, where.files, where.column, where.sql_type,
+                                        where.low, where.high)
+    print(f"   Row groups skipped by min/max statistics on {where.column}: {skipped} of {total}")
+
+def run_query(conn, name, sql=None):
+    """Run a catalog query (or `sql` in its place) through query_metrics.
+
+    Returns a relation over the result, for printing.
+    """
+    return conn.from_arrow(query_metrics.execute(conn, sql or QUERIES[name].sql, name))
+
+def text_file_query(conn, name):
+    """Run a catalog query, reading its CSV/JSON files from their Parquet copies.
+
+    CSV reads that can't use a copy (e.g. with filename=true) use the recorded schemas.
+    """
+    return run_query(conn, name,
+                     csv_schemas.rewrite(conn, shadow_cache.rewrite(conn, QUERIES[name].sql)))
+
+def demo_csv_queries(conn):
     """Query CSV files directly with SQL."""
     print("=" * 70)
     print("DIRECT CSV QUERYING")
@@ -23,35 +80,32 @@ def demo_csv_queries():
 
     # Simple query - no loading required!
     print("\n1. Simple aggregation on CSV:")
-    result = duckdb.sql("""
-        SELECT
-            region,
-            loyalty_tier,
-            COUNT(*) as customer_count
-        FROM 'data/customers.csv'
-        GROUP BY region, loyalty_tier
-        ORDER BY region, customer_count DESC
-    """)
+    result = text_file_query(conn, "csv_customers_by_region_tier")
     print(result)
 
     # Join across CSV files without any setup
     print("\n2. Join multiple CSV files (customers + transactions):")
-    result = duckdb.sql("""
-        SELECT
-            c.region,
-            c.loyalty_tier,
-            COUNT(DISTINCT t.transaction_id) as num_transactions,
-            ROUND(SUM(t.total_amount), 2) as total_revenue,
-            ROUND(AVG(t.total_amount), 2) as avg_transaction
-        FROM 'data/transactions.csv' t
-        JOIN 'data/customers.csv' c ON t.customer_id = c.customer_id
-        GROUP BY c.region, c.loyalty_tier
-        ORDER BY total_revenue DESC
-        LIMIT 10
-    """)
+    result = text_file_query(conn, "csv_revenue_by_region_tier")
     print(result)
 
-def demo_parquet_queries():
+    # Sniffing samples every file on every read; the registry does it once per file version
+    stats = csv_schemas.stats()
+    print(f"\n   CSV schemas: {stats['sniffs']} files sniffed, {stats['hits']} reads reused a "
+          f"recorded schema ({csv_schemas.path})")
+    # Only the first query over a file version parses the text; later ones read Parquet
+    stats = shadow_cache.stats()
+    print(f"   Parquet copies: {stats['conversions']} files converted, {stats['hits']} reads "
+          f"used an existing copy ({shadow_cache.directory})")
+
+def run_timed(conn, name):
+    """Run a catalog query through query_metrics and print its results and execution time."""
+    start = time.perf_counter()
+    table = query_metrics.execute(conn, QUERIES[name].sql, name)
+    elapsed = time.perf_counter() - start
+    print(conn.from_arrow(table))
+    print(f"   Execution time: {elapsed*1000:.2f} ms")
+
+def demo_parquet_queries(conn):
     """Query Parquet files - DuckDB's sweet spot."""
     print("\n" + "=" * 70)
     print("DIRECT PARQUET QUERYING (DuckDB's Sweet Spot)")
@@ -60,144 +114,95 @@ def demo_parquet_queries():
     # Parquet files store column statistics, enabling query optimization
     print("\n1. DuckDB reads only needed columns from Parquet:")
 
-    start = time.perf_counter()
     # This only reads the 'total_amount' column due to columnar format
-    result = duckdb.sql("""
-        SELECT
-            SUM(total_amount) as total_revenue,
-            AVG(total_amount) as avg_transaction,
-            COUNT(*) as num_transactions
-        FROM 'data/transactions.parquet'
-    """)
-    elapsed = time.perf_counter() - start
-    print(result)
-    print(f"   Execution time: {elapsed*1000:.2f} ms")
+    run_timed(conn, "parquet_revenue_totals")
 
-    # Parquet predicate pushdown
+    # Parquet predicate pushdown; how much it skips depends on the file layout
+    # (see `01_generate_data.py --cluster-by`)
     print("\n2. Predicate pushdown - DuckDB skips irrelevant row groups:")
-    start = time.perf_counter()
-    result = duckdb.sql("""
-        SELECT
-            strftime(transaction_date::DATE, '%Y-%m') as month,
-            SUM(total_amount) as monthly_revenue
-        FROM 'data/transactions.parquet'
-        WHERE transaction_date >= '2024-01-01'
-        GROUP BY month
-        ORDER BY month
-    """)
-    elapsed = time.perf_counter() - start
-    print(result)
-    print(f"   Execution time: {elapsed*1000:.2f} ms")
+    run_timed(conn, "parquet_monthly_revenue_2024")
+    print_pruning(conn, "parquet_monthly_revenue_2024")
+
+    print("\n3. Narrow date range - selective when files are clustered by date:")
+    run_timed(conn, "parquet_week_revenue")
+    print_pruning(conn, "parquet_week_revenue")
+
+    print("\n4. Point lookup - selective when files are clustered by customer:")
+    run_timed(conn, "parquet_customer_history")
+    print_pruning(conn, "parquet_customer_history")
+
+    # Hive partition pruning
+    print("\n5. Partition pruning - DuckDB skips whole year=/month= directories:")
+    run_timed(conn, "partitioned_monthly_revenue")
 
     # Complex analytical query
-    print("\n3. Complex 3-way join on Parquet files:")
-    start = time.perf_counter()
-    result = duckdb.sql("""
-        SELECT
-            p.category,
-            c.region,
-            COUNT(*) as num_sales,
-            ROUND(SUM(t.total_amount), 2) as revenue,
-            ROUND(SUM(t.quantity * (t.unit_price - p.cost)), 2) as gross_profit
-        FROM 'data/transactions.parquet' t
-        JOIN 'data/products.parquet' p ON t.product_id = p.product_id
-        JOIN 'data/customers.parquet' c ON t.customer_id = c.customer_id
-        WHERE p.is_active = true
-        GROUP BY p.category, c.region
-        ORDER BY revenue DESC
-        LIMIT 15
-    """)
-    elapsed = time.perf_counter() - start
-    print(result)
-    print(f"   Execution time: {elapsed*1000:.2f} ms")
+    print("\n6. Complex 3-way join on Parquet files:")
+    run_timed(conn, "parquet_category_region_profit")
 
-def demo_json_queries():
+def demo_result_cache(conn):
+    """Reuse query results while the files they were computed from are unchanged."""
+    print("\n" + "=" * 70)
+    print("RESULT CACHE")
+    print("=" * 70)
+
+    print("\nThe 3-way join, run twice through result_cache.ResultCache:")
+    cache = ResultCache(metrics=query_metrics)
+    sql = QUERIES["parquet_category_region_profit"].sql
+    for attempt in ("First", "Second"):
+        start = time.perf_counter()
+        table, hit = cache.fetch(conn, sql, "parquet_category_region_profit")
+        elapsed = time.perf_counter() - start
+        print(f"   {attempt} run: {'cache hit' if hit else 'computed'} "
+              f"({table.num_rows} rows) in {elapsed*1000:.2f} ms")
+    print("   Files read: " + ", ".join(result_cache.source_patterns(sql)))
+    print("   Regenerating any of them changes the key, so the next run recomputes.")
+
+def demo_json_queries(conn):
     """Query JSON files with SQL."""
     print("\n" + "=" * 70)
     print("DIRECT JSON QUERYING")
     print("=" * 70)
 
     print("\n1. Query newline-delimited JSON directly:")
-    result = duckdb.sql("""
-        SELECT
-            payment_method,
-            channel,
-            COUNT(*) as transactions,
-            ROUND(SUM(total_amount), 2) as revenue
-        FROM 'data/transactions_sample.json'
-        GROUP BY payment_method, channel
-        ORDER BY revenue DESC
-    """)
+    result = text_file_query(conn, "json_revenue_by_payment_channel")
     print(result)
 
-def demo_mixed_format_queries():
+def demo_mixed_format_queries(conn):
     """Query across different file formats in a single query!"""
     print("\n" + "=" * 70)
     print("MIXED FORMAT QUERIES (The Really Cool Part)")
     print("=" * 70)
 
     print("\nJoin CSV, Parquet, and JSON in a single query:")
-    result = duckdb.sql("""
-        SELECT
-            c.loyalty_tier,
-            COUNT(DISTINCT c.customer_id) as customers,
-            COUNT(t.transaction_id) as transactions,
-            ROUND(SUM(t.total_amount), 2) as revenue
-        FROM 'data/customers.csv' c
-        JOIN 'data/transactions.parquet' t ON c.customer_id = t.customer_id
-        GROUP BY c.loyalty_tier
-        ORDER BY revenue DESC
-    """)
+    result = text_file_query(conn, "mixed_format_revenue_by_tier")
     print(result)
 
-def demo_glob_patterns():
+def demo_glob_patterns(conn):
     """Query multiple files using glob patterns."""
     print("\n" + "=" * 70)
     print("GLOB PATTERNS - Query Multiple Files at Once")
     print("=" * 70)
 
     print("\n1. Query all Parquet files:")
-    result = duckdb.sql("""
-        SELECT
-            filename,
-            COUNT(*) as row_count
-        FROM read_parquet('data/*.parquet', filename=true)
-        GROUP BY filename
-    """)
+    result = run_query(conn, "glob_parquet_row_counts")
     print(result)
 
     print("\n2. Query all CSV files with schema discovery:")
-    result = duckdb.sql("""
-        SELECT
-            filename,
-            COUNT(*) as row_count
-        FROM read_csv_auto('data/*.csv', filename=true)
-        GROUP BY filename
-    """)
+    result = text_file_query(conn, "glob_csv_row_counts")
     print(result)
 
-def demo_file_metadata():
+def demo_file_metadata(conn):
     """Inspect file metadata without full scan."""
     print("\n" + "=" * 70)
     print("FILE METADATA INSPECTION")
     print("=" * 70)
 
     print("\n1. Parquet file metadata (schema + statistics):")
-    result = duckdb.sql("""
-        SELECT * FROM parquet_schema('data/transactions.parquet')
-    """)
+    result = run_query(conn, "parquet_schema")
     print(result)
 
     print("\n2. Parquet file statistics:")
-    result = duckdb.sql("""
-        SELECT
-            file_name,
-            row_group_id,
-            row_group_num_rows,
-            row_group_bytes
-        FROM parquet_metadata('data/transactions.parquet')
-        LIMIT 5
-    """)
+    result = run_query(conn, "parquet_row_groups")
     print(result)
 
 def compare_csv_vs_parquet():
@@ -206,55 +211,41 @@ def compare_csv_vs_parquet():
     print("PERFORMANCE COMPARISON: CSV vs PARQUET")
     print("=" * 70)
 
-    query_csv = """
-        SELECT
-            payment_method,
-            COUNT(*) as cnt,
-            SUM(total_amount) as revenue
-        FROM 'data/transactions.csv'
-        GROUP BY payment_method
-    """
-
-    query_parquet = """
-        SELECT
-            payment_method,
-            COUNT(*) as cnt,
-            SUM(total_amount) as revenue
-        FROM 'data/transactions.parquet'
-        GROUP BY payment_method
-    """
-
-    # Warm up
-    duckdb.sql(query_csv)
-    duckdb.sql(query_parquet)
-
-    # Benchmark
-    iterations = 5
-
-    csv_times = []
-    for _ in range(iterations):
-        start = time.perf_counter()
-        duckdb.sql(query_csv)
-        csv_times.append(time.perf_counter() - start)
-
-    parquet_times = []
-    for _ in range(iterations):
-        start = time.perf_counter()
-        duckdb.sql(query_parquet)
-        parquet_times.append(time.perf_counter() - start)
-
-    avg_csv = sum(csv_times) / len(csv_times) * 1000
-    avg_parquet = sum(parquet_times) / len(parquet_times) * 1000
-
-    print(f"\nAggregation query ({iterations} iterations):")
-    print(f"  CSV average:     {avg_csv:.2f} ms")
-    print(f"  Parquet average: {avg_parquet:.2f} ms")
-    print(f"  Speedup:         {avg_csv/avg_parquet:.1f}x faster with Parquet")
-
-    # File size comparison
-    import os
-    csv_size = os.path.getsize("data/transactions.csv") / (1024 * 1024)
-    parquet_size = os.path.getsize("data/transactions.parquet") / (1024 * 1024)
+    query_csv = QUERIES["csv_revenue_by_payment"]
+    query_parquet = QUERIES["parquet_revenue_by_payment"]
+    explicit_name = f"{query_csv.name}_explicit"
+    shadow_name = f"{query_csv.name}_shadow"
+    with connections.connect() as conn:
+        explicit_sql = csv_schemas.rewrite(conn, query_csv.sql)
+        shadow_sql = shadow_cache.rewrite(conn, query_csv.sql)
+
+    results = (run_benchmark(query_csv.name, query_csv.sql, files=["data/transactions*.csv"])
+               + run_benchmark(explicit_name, explicit_sql, files=["data/transactions*.csv"])
+               + run_benchmark(shadow_name, shadow_sql, files=[f"{shadow_cache.directory}/*.parquet"])
+               + run_benchmark(query_parquet.name, query_parquet.sql,
+                               files=["data/transactions*.parquet"]))
+
+    print("\nAggregation query (cold = fresh connection + evicted page cache):")
+    print_results(results)
+
+    median = {(r["name"], r["mode"]): r["median_ms"] for r in results}
+    for mode in ("cold", "warm"):
+        speedup = median[(query_csv.name, mode)] / median[(query_parquet.name, mode)]
+        print(f"  Speedup ({mode}): {speedup:.1f}x faster with Parquet (median)")
+    for mode in ("cold", "warm"):
+        speedup = median[(query_csv.name, mode)] / median[(explicit_name, mode)]
+        print(f"  Recorded CSV schema ({mode}): {speedup:.1f}x faster than sniffing (median)")
+    for mode in ("cold", "warm"):
+        speedup = median[(query_csv.name, mode)] / median[(shadow_name, mode)]
+        print(f"  Parquet copy of the CSV ({mode}): {speedup:.1f}x faster than the CSV (median)")
+
+    path = write_results(results, "csv_vs_parquet")
+    print(f"\nResults written to {path} and {path[:-len('.json')]}.csv")
+
+    # File size comparison (summed over shards when generated with --workers)
+    import glob
+    csv_size = sum(map(os.path.getsize, glob.glob("data/transactions*.csv"))) / (1024 * 1024)
+    parquet_size = sum(map(os.path.getsize, glob.glob("data/transactions*.parquet"))) / (1024 * 1024)
 
     print(f"\nFile sizes:")
     print(f"  CSV:     {csv_size:.2f} MB")
@@ -268,14 +259,20 @@ def main():
     print("\nDuckDB can query files directly using SQL - no ETL required!")
     print("This is one of its most powerful features for data analysis.\n")
 
-    demo_csv_queries()
-    demo_parquet_queries()
-    demo_json_queries()
-    demo_mixed_format_queries()
-    demo_glob_patterns()
-    demo_file_metadata()
+    with connections.get_pool().connection() as conn:
+        demo_csv_queries(conn)
+        demo_parquet_queries(conn)
+        demo_result_cache(conn)
+        demo_json_queries(conn)
+        demo_mixed_format_queries(conn)
+        demo_glob_patterns(conn)
+        demo_file_metadata(conn)
     compare_csv_vs_parquet()
 
+    path = os.path.join(RESULTS_DIR, "direct_file_queries.prom")
+    query_metrics.write(path)
+    print(f"\nQuery metrics (Prometheus text format) written to {path}")
+
     print("\n" + "=" * 70)
     print("KEY TAKEAWAYS")
     print("=" * 70)
@@ -283,9 +280,12 @@ def main():
 1. Zero-setup queries: Query CSV/Parquet/JSON directly with SQL
 2. Automatic schema detection: DuckDB infers column types
 3. Cross-format joins: Mix CSV, Parquet, and JSON in one query
-4. Parquet optimization: Columnar reads + predicate pushdown
+4. Parquet optimization: Columnar reads + predicate pushdown + partition pruning
 5. Glob patterns: Query multiple files as one logical table
 6. Metadata inspection: Check file schema without loading data
+7. Result caching: Unchanged files mean the previous result can be reused
+8. CSV schema registry: Sniff each file once, then read it with explicit types
+9. Parquet shadow copies: Convert text files once, query the columnar copy after
 """)
 
 if __name__ == "__main__":
@@ -3,6 +3,7 @@
 # requires-python = ">=3.9"
 # dependencies = [
 #   "duckdb",
+#   "pyarrow",
 # ]
 # ///
 """
@@ -15,466 +16,213 @@ DuckDB is designed for OLAP workloads and excels at:
 - Statistical functions
 """
 
-import duckdb
+import argparse
 import time
 
-def setup_views():
-    """Create views for cleaner queries."""
-    duckdb.sql("""
-        CREATE OR REPLACE VIEW transactions AS
-        SELECT * FROM 'data/transactions.parquet';
-
-        CREATE OR REPLACE VIEW customers AS
-        SELECT * FROM 'data/customers.parquet';
-
-        CREATE OR REPLACE VIEW products AS
-        SELECT * FROM 'data/products.parquet';
-    """)
-
-def demo_window_functions():
+import catalog
+import connections
+import queries
+import rollups
+from metrics import QueryMetrics
+from queries import QUERIES
+from result_cache import ResultCache
+
+# Set by --rollups: answer queries from the materialized rollups where possible
+use_rollups = False
+# Set by --cache: reuse results from earlier runs while the data files are unchanged
+result_cache = None
+# Latency, rows and bytes read of every query, exported with --metrics-file/--metrics-port
+# (rows scanned too with --metrics-rows-scanned)
+query_metrics = QueryMetrics()
+
+def query_sql(name):
+    """SQL for a catalog query, or for its rollup-backed variant with --rollups."""
+    return QUERIES[queries.rollup_variant(name) if use_rollups else name].sql
+
+def run_query(conn, name):
+    """Relation with a catalog query's results, served from the result cache with --cache."""
+    sql = query_sql(name)
+    if result_cache is None:
+        table = query_metrics.execute(conn, sql, name)
+    else:
+        table, _ = result_cache.fetch(conn, sql, name)
+    return conn.from_arrow(table)
+
+def demo_window_functions(conn):
     """Demonstrate powerful window functions."""
     print("=" * 70)
     print("WINDOW FUNCTIONS")
     print("=" * 70)
 
     print("\n1. Running totals and moving averages:")
-    result = duckdb.sql("""
-        WITH daily_sales AS (
-            SELECT
-                transaction_date::DATE as sale_date,
-                SUM(total_amount) as daily_revenue
-            FROM transactions
-            WHERE transaction_date >= '2024-01-01'
-              AND transaction_date < '2024-02-01'
-            GROUP BY sale_date
-        )
-        SELECT
-            sale_date,
-            daily_revenue,
-            SUM(daily_revenue) OVER (ORDER BY sale_date) as running_total,
-            ROUND(AVG(daily_revenue) OVER (
-                ORDER BY sale_date
-                ROWS BETWEEN 6 PRECEDING AND CURRENT ROW
-            ), 2) as moving_avg_7day
-        FROM daily_sales
-        ORDER BY sale_date
-        LIMIT 15
-    """)
+    result = run_query(conn, "running_totals")
     print(result)
 
     print("\n2. Ranking customers by spending:")
-    result = duckdb.sql("""
-        WITH customer_spending AS (
-            SELECT
-                c.customer_id,
-                c.first_name || ' ' || c.last_name as customer_name,
-                c.loyalty_tier,
-                c.region,
-                SUM(t.total_amount) as total_spent,
-                COUNT(*) as num_purchases
-            FROM transactions t
-            JOIN customers c ON t.customer_id = c.customer_id
-            GROUP BY c.customer_id, c.first_name, c.last_name, c.loyalty_tier, c.region
-        )
-        SELECT
-            customer_name,
-            loyalty_tier,
-            region,
-            total_spent,
-            num_purchases,
-            RANK() OVER (ORDER BY total_spent DESC) as overall_rank,
-            RANK() OVER (PARTITION BY region ORDER BY total_spent DESC) as region_rank
-        FROM customer_spending
-        QUALIFY region_rank <= 3
-        ORDER BY region, region_rank
-    """)
+    result = run_query(conn, "customer_rankings")
     print(result)
 
     print("\n3. Year-over-year comparison with LAG:")
-    result = duckdb.sql("""
-        WITH monthly_revenue AS (
-            SELECT
-                strftime(transaction_date::DATE, '%Y-%m') as month,
-                strftime(transaction_date::DATE, '%Y') as year,
-                strftime(transaction_date::DATE, '%m') as month_num,
-                SUM(total_amount) as revenue
-            FROM transactions
-            GROUP BY month, year, month_num
-        )
-        SELECT
-            month,
-            revenue,
-            LAG(revenue, 12) OVER (ORDER BY month) as prev_year_revenue,
-            ROUND(
-                (revenue - LAG(revenue, 12) OVER (ORDER BY month))
-                / LAG(revenue, 12) OVER (ORDER BY month) * 100,
-                2
-            ) as yoy_growth_pct
-        FROM monthly_revenue
-        WHERE year = '2024'
-        ORDER BY month
-    """)
+    result = run_query(conn, "yoy_revenue")
     print(result)
 
     print("\n4. NTILE - Customer segmentation into quartiles:")
-    result = duckdb.sql("""
-        WITH customer_value AS (
-            SELECT
-                c.customer_id,
-                c.loyalty_tier,
-                SUM(t.total_amount) as lifetime_value
-            FROM transactions t
-            JOIN customers c ON t.customer_id = c.customer_id
-            GROUP BY c.customer_id, c.loyalty_tier
-        ),
-        with_quartiles AS (
-            SELECT
-                customer_id,
-                lifetime_value,
-                NTILE(4) OVER (ORDER BY lifetime_value DESC) as quartile
-            FROM customer_value
-        )
-        SELECT
-            quartile,
-            COUNT(*) as customer_count,
-            ROUND(MIN(lifetime_value), 2) as min_ltv,
-            ROUND(MAX(lifetime_value), 2) as max_ltv,
-            ROUND(AVG(lifetime_value), 2) as avg_ltv
-        FROM with_quartiles
-        GROUP BY quartile
-        ORDER BY quartile
-    """)
+    result = run_query(conn, "ltv_quartiles")
     print(result)
 
-def demo_advanced_aggregations():
+def demo_advanced_aggregations(conn):
     """Demonstrate advanced aggregation capabilities."""
     print("\n" + "=" * 70)
     print("ADVANCED AGGREGATIONS")
     print("=" * 70)
 
     print("\n1. GROUPING SETS - Multiple aggregation levels in one query:")
-    result = duckdb.sql("""
-        SELECT
-            COALESCE(p.category, 'ALL CATEGORIES') as category,
-            COALESCE(c.region, 'ALL REGIONS') as region,
-            COUNT(*) as num_sales,
-            ROUND(SUM(t.total_amount), 2) as revenue
-        FROM transactions t
-        JOIN products p ON t.product_id = p.product_id
-        JOIN customers c ON t.customer_id = c.customer_id
-        GROUP BY GROUPING SETS (
-            (p.category, c.region),
-            (p.category),
-            (c.region),
-            ()
-        )
-        ORDER BY category, region
-        LIMIT 20
-    """)
+    result = run_query(conn, "grouping_sets_category_region")
     print(result)
 
     print("\n2. CUBE - All dimension combinations:")
-    result = duckdb.sql("""
-        SELECT
-            COALESCE(c.loyalty_tier, 'ALL') as loyalty_tier,
-            COALESCE(t.channel, 'ALL') as channel,
-            COUNT(*) as transactions,
-            ROUND(AVG(t.total_amount), 2) as avg_order_value
-        FROM transactions t
-        JOIN customers c ON t.customer_id = c.customer_id
-        GROUP BY CUBE (c.loyalty_tier, t.channel)
-        ORDER BY loyalty_tier, channel
-    """)
+    result = run_query(conn, "cube_tier_channel")
     print(result)
 
     print("\n3. ROLLUP - Hierarchical totals:")
-    result = duckdb.sql("""
-        SELECT
-            COALESCE(p.category, 'TOTAL') as category,
-            COALESCE(p.subcategory, 'Subtotal') as subcategory,
-            COUNT(*) as num_sales,
-            ROUND(SUM(t.total_amount), 2) as revenue
-        FROM transactions t
-        JOIN products p ON t.product_id = p.product_id
-        WHERE p.category IN ('Electronics', 'Clothing')
-        GROUP BY ROLLUP (p.category, p.subcategory)
-        ORDER BY category NULLS LAST, subcategory NULLS LAST
-    """)
+    result = run_query(conn, "rollup_category_subcategory")
     print(result)
 
-def demo_statistical_functions():
+def demo_statistical_functions(conn):
     """Demonstrate built-in statistical functions."""
     print("\n" + "=" * 70)
     print("STATISTICAL FUNCTIONS")
     print("=" * 70)
 
     print("\n1. Percentiles and distribution analysis:")
-    result = duckdb.sql("""
-        SELECT
-            channel,
-            COUNT(*) as n,
-            ROUND(AVG(total_amount), 2) as mean,
-            ROUND(STDDEV(total_amount), 2) as std_dev,
-            ROUND(PERCENTILE_CONT(0.25) WITHIN GROUP (ORDER BY total_amount), 2) as p25,
-            ROUND(PERCENTILE_CONT(0.50) WITHIN GROUP (ORDER BY total_amount), 2) as median,
-            ROUND(PERCENTILE_CONT(0.75) WITHIN GROUP (ORDER BY total_amount), 2) as p75,
-            ROUND(PERCENTILE_CONT(0.95) WITHIN GROUP (ORDER BY total_amount), 2) as p95
-        FROM transactions
-        GROUP BY channel
-    """)
+    result = run_query(conn, "amount_percentiles_by_channel")
     print(result)
 
     print("\n2. Correlation analysis:")
-    result = duckdb.sql("""
-        SELECT
-            p.category,
-            ROUND(CORR(t.discount_percent, t.quantity), 3) as discount_qty_corr,
-            ROUND(CORR(t.unit_price, t.quantity), 3) as price_qty_corr,
-            COUNT(*) as sample_size
-        FROM transactions t
-        JOIN products p ON t.product_id = p.product_id
-        GROUP BY p.category
-        ORDER BY discount_qty_corr DESC
-    """)
+    result = run_query(conn, "discount_correlation_by_category")
     print(result)
 
     print("\n3. Histogram / Distribution buckets:")
-    result = duckdb.sql("""
-        WITH buckets AS (
-            SELECT
-                CASE
-                    WHEN total_amount < 100 THEN '0-100'
-                    WHEN total_amount < 250 THEN '100-250'
-                    WHEN total_amount < 500 THEN '250-500'
-                    WHEN total_amount < 1000 THEN '500-1000'
-                    ELSE '1000+'
-                END as amount_bucket,
-                CASE
-                    WHEN total_amount < 100 THEN 1
-                    WHEN total_amount < 250 THEN 2
-                    WHEN total_amount < 500 THEN 3
-                    WHEN total_amount < 1000 THEN 4
-                    ELSE 5
-                END as bucket_order,
-                total_amount
-            FROM transactions
-        )
-        SELECT
-            amount_bucket,
-            COUNT(*) as count,
-            ROUND(COUNT(*) * 100.0 / SUM(COUNT(*)) OVER (), 2) as percentage
-        FROM buckets
-        GROUP BY amount_bucket, bucket_order
-        ORDER BY bucket_order
-    """)
+    result = run_query(conn, "amount_histogram")
     print(result)
 
-def demo_time_series_analysis():
+def demo_time_series_analysis(conn):
     """Demonstrate time-series analysis capabilities."""
     print("\n" + "=" * 70)
     print("TIME-SERIES ANALYSIS")
     print("=" * 70)
 
     print("\n1. Seasonality analysis - Day of week patterns:")
-    result = duckdb.sql("""
-        SELECT
-            DAYNAME(transaction_date::DATE) as day_of_week,
-            EXTRACT(ISODOW FROM transaction_date::DATE) as day_num,
-            COUNT(*) as num_transactions,
-            ROUND(AVG(total_amount), 2) as avg_order_value,
-            ROUND(SUM(total_amount), 2) as total_revenue
-        FROM transactions
-        GROUP BY day_of_week, day_num
-        ORDER BY day_num
-    """)
+    result = run_query(conn, "day_of_week_pattern")
     print(result)
 
     print("\n2. Hour-of-day analysis:")
-    result = duckdb.sql("""
-        SELECT
-            CAST(SUBSTR(transaction_time, 1, 2) AS INTEGER) as hour,
-            COUNT(*) as num_transactions,
-            ROUND(AVG(total_amount), 2) as avg_order_value
-        FROM transactions
-        GROUP BY hour
-        ORDER BY hour
-    """)
+    result = run_query(conn, "hour_of_day_pattern")
     print(result)
 
     print("\n3. Month-over-month growth rates:")
-    result = duckdb.sql("""
-        WITH monthly AS (
-            SELECT
-                strftime(transaction_date::DATE, '%Y-%m') as month,
-                SUM(total_amount) as revenue
-            FROM transactions
-            GROUP BY month
-        )
-        SELECT
-            month,
-            ROUND(revenue, 2) as revenue,
-            ROUND(
-                (revenue - LAG(revenue) OVER (ORDER BY month))
-                / LAG(revenue) OVER (ORDER BY month) * 100,
-                2
-            ) as mom_growth_pct
-        FROM monthly
-        ORDER BY month
-    """)
+    result = run_query(conn, "mom_growth")
     print(result)
 
-def demo_cohort_analysis():
+def demo_cohort_analysis(conn):
     """Demonstrate cohort analysis capabilities."""
     print("\n" + "=" * 70)
     print("COHORT ANALYSIS")
     print("=" * 70)
 
     print("\n1. Customer cohort by signup month with retention:")
-    result = duckdb.sql("""
-        WITH customer_cohorts AS (
-            SELECT
-                c.customer_id,
-                strftime(c.signup_date::DATE, '%Y-%m') as cohort_month,
-                strftime(t.transaction_date::DATE, '%Y-%m') as purchase_month
-            FROM customers c
-            JOIN transactions t ON c.customer_id = t.customer_id
-        ),
-        cohort_sizes AS (
-            SELECT
-                cohort_month,
-                COUNT(DISTINCT customer_id) as cohort_size
-            FROM customer_cohorts
-            GROUP BY cohort_month
-        ),
-        monthly_activity AS (
-            SELECT
-                cohort_month,
-                purchase_month,
-                COUNT(DISTINCT customer_id) as active_customers
-            FROM customer_cohorts
-            GROUP BY cohort_month, purchase_month
-        )
-        SELECT
-            m.cohort_month,
-            s.cohort_size,
-            m.purchase_month,
-            m.active_customers,
-            ROUND(m.active_customers * 100.0 / s.cohort_size, 1) as retention_pct
-        FROM monthly_activity m
-        JOIN cohort_sizes s ON m.cohort_month = s.cohort_month
-        WHERE m.cohort_month IN ('2021-01', '2021-06', '2022-01')
-          AND m.purchase_month >= '2024-01'
-          AND m.purchase_month <= '2024-06'
-        ORDER BY m.cohort_month, m.purchase_month
-    """)
+    result = run_query(conn, "cohort_retention")
     print(result)
 
-def demo_funnel_analysis():
+def demo_funnel_analysis(conn):
     """Demonstrate funnel-style analysis."""
     print("\n" + "=" * 70)
     print("FUNNEL / SEGMENTATION ANALYSIS")
     print("=" * 70)
 
     print("\n1. Customer purchase frequency distribution:")
-    result = duckdb.sql("""
-        WITH customer_purchases AS (
-            SELECT
-                customer_id,
-                COUNT(*) as num_purchases
-            FROM transactions
-            GROUP BY customer_id
-        ),
-        frequency_segments AS (
-            SELECT
-                CASE
-                    WHEN num_purchases = 1 THEN '1 purchase'
-                    WHEN num_purchases BETWEEN 2 AND 5 THEN '2-5 purchases'
-                    WHEN num_purchases BETWEEN 6 AND 20 THEN '6-20 purchases'
-                    WHEN num_purchases BETWEEN 21 AND 50 THEN '21-50 purchases'
-                    ELSE '50+ purchases'
-                END as frequency_segment,
-                CASE
-                    WHEN num_purchases = 1 THEN 1
-                    WHEN num_purchases BETWEEN 2 AND 5 THEN 2
-                    WHEN num_purchases BETWEEN 6 AND 20 THEN 3
-                    WHEN num_purchases BETWEEN 21 AND 50 THEN 4
-                    ELSE 5
-                END as segment_order,
-                num_purchases
-            FROM customer_purchases
-        )
-        SELECT
-            frequency_segment,
-            COUNT(*) as customers,
-            ROUND(COUNT(*) * 100.0 / SUM(COUNT(*)) OVER (), 1) as pct_of_customers
-        FROM frequency_segments
-        GROUP BY frequency_segment, segment_order
-        ORDER BY segment_order
-    """)
+    result = run_query(conn, "purchase_frequency")
     print(result)
 
     print("\n2. RFM (Recency, Frequency, Monetary) Analysis:")
-    result = duckdb.sql("""
-        WITH customer_metrics AS (
-            SELECT
-                customer_id,
-                MAX(transaction_date::DATE) as last_purchase,
-                COUNT(*) as frequency,
-                SUM(total_amount) as monetary
-            FROM transactions
-            GROUP BY customer_id
-        ),
-        rfm_scores AS (
-            SELECT
-                customer_id,
-                NTILE(5) OVER (ORDER BY last_purchase DESC) as recency_score,
-                NTILE(5) OVER (ORDER BY frequency) as frequency_score,
-                NTILE(5) OVER (ORDER BY monetary) as monetary_score
-            FROM customer_metrics
-        )
-        SELECT
-            CASE
-                WHEN recency_score >= 4 AND frequency_score >= 4 AND monetary_score >= 4 THEN 'Champions'
-                WHEN recency_score >= 4 AND frequency_score >= 3 THEN 'Loyal Customers'
-                WHEN recency_score >= 3 AND monetary_score >= 4 THEN 'Big Spenders'
-                WHEN recency_score >= 4 AND frequency_score <= 2 THEN 'New Customers'
-                WHEN recency_score <= 2 AND frequency_score >= 3 THEN 'At Risk'
-                WHEN recency_score <= 2 AND frequency_score <= 2 THEN 'Lost'
-                ELSE 'Need Attention'
-            END as segment,
-            COUNT(*) as customer_count,
-            ROUND(AVG(recency_score), 1) as avg_recency,
-            ROUND(AVG(frequency_score), 1) as avg_frequency,
-            ROUND(AVG(monetary_score), 1) as avg_monetary
-        FROM rfm_scores
-        GROUP BY segment
-        ORDER BY customer_count DESC
-    """)
-    print(result)
+    result = run_query(conn, "rfm_segments")
+    print(result)
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="DuckDB analytics and window function demos")
+    parser.add_argument("--rollups", action="store_true",
+                        help=f"answer revenue and per-customer queries from {rollups.ROLLUP_DB}, "
+                             "refreshing it with any new transaction files first")
+    parser.add_argument("--catalog", action="store_true",
+                        help=f"query native tables loaded into {catalog.CATALOG_DB} instead of "
+                             "views over the Parquet files, reloading any whose files changed")
+    parser.add_argument("--cache", action="store_true",
+                        help="serve results from the on-disk result cache when the data files "
+                             "they were computed from are unchanged")
+    parser.add_argument("--metrics-file", metavar="PATH",
+                        help="write query metrics in the Prometheus text format to PATH")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                        help="serve query metrics on http://127.0.0.1:PORT/metrics and keep "
+                             "running until interrupted")
+    parser.add_argument("--metrics-rows-scanned", action="store_true",
+                        help="also record rows scanned per query, from DuckDB's JSON profiler "
+                             "(adds profiling overhead to every query's latency)")
+    return parser.parse_args()
 
 def main():
     """Run all analytics demonstrations."""
+    global use_rollups, result_cache
+    args = parse_args()
+    use_rollups = args.rollups
+    query_metrics.profile = args.metrics_rows_scanned
+    if args.cache:
+        result_cache = ResultCache(metrics=query_metrics)
+
     print("DuckDB Analytics and Window Functions Demonstration")
     print("=" * 70)
     print("\nDuckDB is designed for OLAP workloads with powerful analytical features.\n")
 
-    setup_views()
+    if use_rollups:
+        stats = rollups.refresh()
+        action = "Rebuilt" if stats["rebuilt"] else "Refreshed"
+        print(f"{action} {rollups.ROLLUP_DB}: merged {stats['new_files']} new files "
+              f"({stats['new_rows']:,} rows) in {stats['seconds']:.2f}s\n")
+
+    if args.catalog:
+        stats = catalog.refresh()
+        reloaded = ", ".join(f"{table} ({rows:,} rows)" for table, rows in stats["reloaded"].items())
+        print(f"Catalog {catalog.CATALOG_DB}: {'reloaded ' + reloaded if reloaded else 'up to date'} "
+              f"in {stats['seconds']:.2f}s\n")
 
-    start = time.perf_counter()
+    with connections.get_pool().connection() as conn:
+        if args.catalog:
+            catalog.attach(conn)
+        if use_rollups:
+            rollups.attach(conn)
 
-    demo_window_functions()
-    demo_advanced_aggregations()
-    demo_statistical_functions()
-    demo_time_series_analysis()
-    demo_cohort_analysis()
-    demo_funnel_analysis()
+        start = time.perf_counter()
 
-    elapsed = time.perf_counter() - start
+        demo_window_functions(conn)
+        demo_advanced_aggregations(conn)
+        demo_statistical_functions(conn)
+        demo_time_series_analysis(conn)
+        demo_cohort_analysis(conn)
+        demo_funnel_analysis(conn)
+
+        elapsed = time.perf_counter() - start
 
     print("\n" + "=" * 70)
     print("SUMMARY")
     print("=" * 70)
-    print(f"\nTotal execution time for all analytics: {elapsed:.2f} seconds")
+    source = "catalog tables" if args.catalog else "raw transactions"
+    if use_rollups:
+        source = "rollups where available, else " + source
+    print(f"\nTotal execution time for all analytics ({source}): {elapsed:.2f} seconds")
+    if result_cache is not None:
+        stats = result_cache.stats()
+        print(f"Result cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"({stats['entries']} entries, {stats['bytes'] / 1024:.0f} KB)")
     print("""
 Key DuckDB Analytics Features Demonstrated:
 1. Window functions: ROW_NUMBER, RANK, LAG, LEAD, NTILE, running totals
@@ -487,5 +235,18 @@ DuckDB handles all these complex analytical queries efficiently
 because it's designed from the ground up for OLAP workloads.
 """)
 
+    if args.metrics_file:
+        query_metrics.write(args.metrics_file)
+        print(f"Query metrics written to {args.metrics_file}")
+    if args.metrics_port:
+        server = query_metrics.serve(args.metrics_port)
+        print(f"Serving query metrics on http://127.0.0.1:{args.metrics_port}/metrics "
+              "(Ctrl-C to stop)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+
 if __name__ == "__main__":
     main()
@@ -17,11 +17,37 @@ DuckDB works exceptionally well with Python data science tools:
 - Relational API for method chaining
 """
 
-import duckdb
-import pandas as pd
+import asyncio
+import os
 import time
 
-def demo_pandas_integration():
+import pandas as pd
+import pyarrow.compute as pc
+
+import connections
+import parallel_queries
+import queries
+import streaming
+from async_queries import AsyncQueryRunner
+from benchmark import RESULTS_DIR
+from metrics import QueryMetrics
+from queries import QUERIES
+
+# Latency, rows and bytes read of every demo query, written out by main()
+query_metrics = QueryMetrics()
+
+def run_relation(conn, relation, name):
+    """Execute a relation, recording it in query_metrics; returns a relation over the result.
+
+    DuckDB resolves DataFrames named in the SQL when the relation is created,
+    so queries over the caller's variables work too.
+    """
+    with query_metrics.measure(name) as run:
+        table = relation.to_arrow_table()
+        run["rows"] = table.num_rows
+    return conn.from_arrow(table)
+
+def demo_pandas_integration(conn):
     """Show seamless Pandas integration."""
     print("=" * 70)
     print("PANDAS INTEGRATION")
@@ -39,7 +65,7 @@ def demo_pandas_integration():
     print(df)
 
     # Query the DataFrame directly - no import needed!
-    result = duckdb.sql("""
+    result = run_relation(conn, conn.sql("""
         SELECT
             city,
             COUNT(*) as count,
@@ -47,7 +73,7 @@ def demo_pandas_integration():
         FROM df
         GROUP BY city
         ORDER BY avg_salary DESC
-    """)
+    """), "dataframe_salary_by_city")
     print("\nSQL aggregation result:")
     print(result)
 
@@ -60,23 +86,13 @@ def demo_pandas_integration():
     # Query Parquet file and return Pandas DataFrame in one line
     print("\n3. Load Parquet to Pandas (single line):")
     start = time.perf_counter()
-    top_customers = duckdb.sql("""
-        SELECT
-            c.customer_id,
-            c.first_name || ' ' || c.last_name as name,
-            c.loyalty_tier,
-            SUM(t.total_amount) as total_spent
-        FROM 'data/transactions.parquet' t
-        JOIN 'data/customers.parquet' c ON t.customer_id = c.customer_id
-        GROUP BY c.customer_id, c.first_name, c.last_name, c.loyalty_tier
-        ORDER BY total_spent DESC
-        LIMIT 10
-    """).df()
+    top_customers = query_metrics.execute(conn, QUERIES["top_customers"].sql, "top_customers",
+                                          fetch="df")
     elapsed = time.perf_counter() - start
     print(f"Loaded and processed 500K rows in {elapsed*1000:.2f}ms:")
     print(top_customers)
 
-def demo_dataframe_replacement():
+def demo_dataframe_replacement(conn):
     """Show DuckDB as a Pandas replacement for analytics."""
     print("\n" + "=" * 70)
     print("DUCKDB AS PANDAS REPLACEMENT")
@@ -85,7 +101,8 @@ def demo_dataframe_replacement():
     print("\n1. Compare: Pandas vs DuckDB for complex groupby:")
 
     # Load data
-    df = duckdb.sql("SELECT * FROM 'data/transactions.parquet'").df()
+    df = query_metrics.execute(conn, "SELECT * FROM 'data/transactions*.parquet'",
+                               "load_transactions", fetch="df")
 
     # Pandas approach
     start = time.perf_counter()
@@ -101,7 +118,7 @@ def demo_dataframe_replacement():
 
     # DuckDB approach (directly on DataFrame variable)
     start = time.perf_counter()
-    duckdb_result = duckdb.sql("""
+    duckdb_result = run_relation(conn, conn.sql("""
         SELECT
             channel,
             payment_method,
@@ -112,7 +129,7 @@ def demo_dataframe_replacement():
         FROM df
         GROUP BY channel, payment_method
         ORDER BY total_revenue DESC
-    """)
+    """), "dataframe_groupby")
     duckdb_time = (time.perf_counter() - start) * 1000
 
     print(f"\nPandas groupby time: {pandas_time:.2f} ms")
@@ -133,18 +150,18 @@ def demo_dataframe_replacement():
 
     # DuckDB
     start = time.perf_counter()
-    duckdb_filtered = duckdb.sql("""
+    duckdb_filtered = run_relation(conn, conn.sql("""
         SELECT * FROM df
         WHERE total_amount > 1000
         ORDER BY total_amount DESC
         LIMIT 10
-    """)
+    """), "dataframe_filter_sort")
     duckdb_time = (time.perf_counter() - start) * 1000
 
     print(f"\nPandas filter/sort: {pandas_time:.2f} ms")
     print(f"DuckDB filter/sort: {duckdb_time:.2f} ms")
 
-def demo_relational_api():
+def demo_relational_api(conn):
     """Show DuckDB's relational API for method chaining."""
     print("\n" + "=" * 70)
     print("RELATIONAL API (Method Chaining)")
@@ -153,7 +170,7 @@ def demo_relational_api():
     print("\nDuckDB offers a Pandas-like API for those who prefer method chaining:")
 
     # Get relation from Parquet file
-    transactions = duckdb.read_parquet('data/transactions.parquet')
+    transactions = conn.read_parquet('data/transactions*.parquet')
 
     # Chain operations
     result = (transactions
@@ -164,58 +181,70 @@ def demo_relational_api():
     )
 
     print("\nMethod chain: filter -> aggregate -> order -> limit")
-    print(result)
+    print(run_relation(conn, result, "relational_chain"))
 
     # Can also join relations
     print("\n2. Joining relations:")
-    customers = duckdb.read_parquet('data/customers.parquet')
-    products = duckdb.read_parquet('data/products.parquet')
-
-    # Create a complex join
-    result = duckdb.sql("""
-        SELECT
-            c.region,
-            p.category,
-            COUNT(*) as transactions,
-            ROUND(SUM(t.total_amount), 2) as revenue
-        FROM transactions t
-        JOIN customers c ON t.customer_id = c.customer_id
-        JOIN products p ON t.product_id = p.product_id
-        WHERE t.discount_percent >= 20
-        GROUP BY c.region, p.category
-        ORDER BY revenue DESC
-        LIMIT 10
-    """)
-    print(result)
+    customers = conn.read_parquet('data/customers.parquet').set_alias("c")
+    products = conn.read_parquet('data/products.parquet').set_alias("p")
+
+    # The same result as QUERIES["high_discount_revenue"], built from the relations
+    result = (transactions.set_alias("t")
+        .filter("t.discount_percent >= 20")
+        .join(customers, "t.customer_id = c.customer_id")
+        .join(products, "t.product_id = p.product_id")
+        .aggregate("c.region, p.category, COUNT(*) as transactions, "
+                   "ROUND(SUM(t.total_amount), 2) as revenue")
+        .order("revenue DESC")
+        .limit(10)
+    )
+    print(run_relation(conn, result, "relational_join"))
 
-def demo_arrow_integration():
+def demo_arrow_integration(conn):
     """Show Apache Arrow integration."""
     print("\n" + "=" * 70)
     print("APACHE ARROW INTEGRATION")
     print("=" * 70)
 
     print("\n1. Zero-copy conversion to Arrow:")
-    result = duckdb.sql("""
-        SELECT
-            channel,
-            COUNT(*) as count,
-            SUM(total_amount) as revenue
-        FROM 'data/transactions.parquet'
-        GROUP BY channel
-    """)
-
-    # Convert to Arrow Table
-    arrow_table = result.fetch_arrow_table()
+    # Fetch the results as an Arrow Table
+    arrow_table = query_metrics.execute(conn, QUERIES["revenue_by_channel"].sql,
+                                        "revenue_by_channel")
     print(f"Arrow Table type: {type(arrow_table)}")
     print(f"Schema: {arrow_table.schema}")
     print(f"Num rows: {arrow_table.num_rows}")
 
     # Arrow tables can be queried directly too
     print("\n2. Query Arrow tables directly:")
-    result2 = duckdb.sql("SELECT * FROM arrow_table WHERE revenue > 80000000")
+    result2 = run_relation(conn, conn.sql("SELECT * FROM arrow_table WHERE revenue > 80000000"),
+                           "arrow_table_filter")
     print(result2)
 
-def demo_udf():
+    # fetch_arrow_table() and .df() hold the whole result in memory at once
+    print("\n3. Streaming large results as fixed-size record batches:")
+    sql = "SELECT * FROM 'data/transactions*.parquet'"
+    stats = streaming.BatchStats(query_metrics.stream(
+        streaming.iter_batches(conn, sql, batch_size=50_000), "stream_large_orders"))
+    large_orders = streaming.filter_batches(stats, pc.field("total_amount") > 500)
+    summary = streaming.aggregate(large_orders, ["channel"],
+                                  [("total_amount", "sum"), ("total_amount", "count")])
+    print(summary.sort_by("channel").to_pandas().to_string(index=False))
+    print(f"Streamed {stats.rows:,} rows in {stats.num_batches} batches: "
+          f"{stats.max_batch_bytes / 1024**2:.1f} MB largest batch in memory, "
+          f"{stats.total_bytes / 1024**2:.1f} MB for the whole result")
+
+    export_path = "data/exports/large_orders.parquet"
+    batches = query_metrics.stream(streaming.iter_batches(conn, sql, batch_size=50_000),
+                                   "export_large_orders")
+    large_orders = streaming.filter_batches(batches, pc.field("total_amount") > 500)
+    rows = streaming.write_parquet(
+        streaming.select_columns(large_orders, ["transaction_id", "channel", "total_amount"]),
+        export_path)
+    print(f"Exported {rows:,} rows batch by batch to {export_path} "
+          f"({os.path.getsize(export_path) / 1024:.0f} KB)")
+    os.remove(export_path)
+
+def demo_udf(conn):
     """Demonstrate User Defined Functions."""
     print("\n" + "=" * 70)
     print("USER DEFINED FUNCTIONS (UDF)")
@@ -237,21 +266,53 @@ This allows extending SQL with custom Python logic when needed.
 
     # Use native SQL CASE as a simpler demonstration
     print("Example using native SQL CASE (preferred for performance):")
-    result = duckdb.sql("""
-        SELECT
-            CASE
-                WHEN total_amount < 100 THEN 'small'
-                WHEN total_amount < 500 THEN 'medium'
-                ELSE 'large'
-            END as size_category,
-            COUNT(*) as count,
-            ROUND(AVG(total_amount), 2) as avg_amount
-        FROM 'data/transactions.parquet'
-        GROUP BY size_category
-        ORDER BY avg_amount
-    """)
+    result = conn.from_arrow(query_metrics.execute(conn, QUERIES["order_size_buckets"].sql,
+                                                   "order_size_buckets"))
     print(result)
 
+async def measure_loop_lag(lags, interval=0.005):
+    """Record how late the event loop wakes up from each short sleep."""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+async def async_queries_demo():
+    """Serve dashboard queries concurrently without blocking the event loop."""
+    async with AsyncQueryRunner(max_concurrency=4, timeout=10, metrics=query_metrics) as runner:
+        lags = []
+        heartbeat = asyncio.create_task(measure_loop_lag(lags))
+
+        names = ["top_customers", "monthly_revenue", "rfm_segments", "cohort_retention"]
+        start = time.perf_counter()
+        tables = await runner.fetch_many(names)
+        elapsed = (time.perf_counter() - start) * 1000
+        for name, table in tables:
+            print(f"   {name:<20} {table.num_rows:>4} rows x {table.num_columns} columns")
+        print(f"   {len(names)} queries in {elapsed:.0f} ms; "
+              f"event loop never stalled more than {max(lags) * 1000:.1f} ms")
+
+        print("\n2. Streaming Arrow batches:")
+        batches = [batch async for batch in runner.stream("customer_rankings", batch_size=5)]
+        print(f"   customer_rankings arrived as {len(batches)} batches of up to 5 rows")
+
+        print("\n3. Timeouts interrupt the query inside DuckDB:")
+        try:
+            await runner.fetch_arrow("cohort_retention", timeout=0.01)
+        except TimeoutError as e:
+            print(f"   {e}")
+
+        heartbeat.cancel()
+
+def demo_async_queries():
+    """Run named queries from asyncio, as an async web service would."""
+    print("\n" + "=" * 70)
+    print("ASYNCIO QUERY API")
+    print("=" * 70)
+
+    print("\n1. Concurrent queries off the event loop (async_queries.AsyncQueryRunner):")
+    asyncio.run(async_queries_demo())
+
 def demo_in_memory_vs_persistent():
     """Compare in-memory vs persistent database modes."""
     print("\n" + "=" * 70)
@@ -264,7 +325,7 @@ def demo_in_memory_vs_persistent():
     print("   - Perfect for ad-hoc queries on files")
 
     # In-memory example
-    mem_conn = duckdb.connect()
+    mem_conn = connections.connect()
     mem_conn.execute("CREATE TABLE test AS SELECT * FROM 'data/products.parquet'")
     result = mem_conn.execute("SELECT COUNT(*) FROM test").fetchone()
     print(f"   - In-memory table has {result[0]} rows")
@@ -276,20 +337,12 @@ def demo_in_memory_vs_persistent():
     print("   - Good for storing processed data or indexes")
 
     # Persistent example
-    import os
     db_path = 'data/analytics.duckdb'
     if os.path.exists(db_path):
         os.remove(db_path)
 
-    persist_conn = duckdb.connect(db_path)
-    persist_conn.execute("""
-        CREATE TABLE monthly_revenue AS
-        SELECT
-            strftime(transaction_date::DATE, '%Y-%m') as month,
-            SUM(total_amount) as revenue
-        FROM 'data/transactions.parquet'
-        GROUP BY month
-    """)
+    persist_conn = connections.connect(db_path)
+    persist_conn.execute(f"CREATE TABLE monthly_revenue AS {QUERIES['monthly_revenue'].sql}")
 
     result = persist_conn.execute("SELECT COUNT(*) FROM monthly_revenue").fetchone()
     print(f"   - Persistent table has {result[0]} months of data")
@@ -301,7 +354,7 @@ def demo_in_memory_vs_persistent():
     persist_conn.close()
 
     # Reopen and verify persistence
-    persist_conn2 = duckdb.connect(db_path)
+    persist_conn2 = connections.connect(db_path)
     result = persist_conn2.execute("SELECT * FROM monthly_revenue LIMIT 3").fetchdf()
     print(f"   - Data persists across connections:")
     print(result.to_string(index=False))
@@ -310,8 +363,8 @@ def demo_in_memory_vs_persistent():
     # Cleanup
     os.remove(db_path)
 
-def demo_concurrent_readers():
-    """Show DuckDB's concurrent read capabilities."""
+def demo_concurrent_readers(workers=4):
+    """Run the analytics queries from 03 concurrently on per-thread cursors."""
     print("\n" + "=" * 70)
     print("CONCURRENT ACCESS")
     print("=" * 70)
@@ -320,35 +373,55 @@ def demo_concurrent_readers():
 DuckDB supports:
 - Multiple readers can access the same database concurrently
 - Single writer at a time (with WAL for durability)
-- For analytics, often best to use separate in-memory instances
+- Cursors on one database run queries side by side while sharing its views,
+  caches and memory budget (connections.ConnectionPool)
 
 This makes it ideal for:
 - Multi-threaded data processing pipelines
-- Jupyter notebooks (each cell can query independently)
+- Dashboard backends firing many independent queries per page load
 - Microservices querying shared Parquet files
 """)
 
+    batch = queries.select(groups=["analytics"])
+    print(f"Running the {len(batch)} analytics queries from 03 sequentially, "
+          f"then on {workers} threads:\n")
+    pool = connections.ConnectionPool(size=workers, setup=queries.setup_views)
+    try:
+        summary = parallel_queries.compare_sequential_parallel(pool, batch, workers,
+                                                               metrics=query_metrics)
+    finally:
+        pool.close()
+    parallel_queries.print_report(summary)
+    print(f"  (CPUs available: {os.cpu_count()}; concurrent queries share DuckDB's thread pool)")
+
 def main():
     """Run all Python integration demonstrations."""
     print("DuckDB Python Integration Demonstration")
     print("=" * 70)
     print("\nDuckDB integrates seamlessly with the Python data science ecosystem.\n")
 
-    demo_pandas_integration()
-    demo_dataframe_replacement()
-    demo_relational_api()
-    demo_arrow_integration()
-    demo_udf()
+    with connections.get_pool().connection() as conn:
+        demo_pandas_integration(conn)
+        demo_dataframe_replacement(conn)
+        demo_relational_api(conn)
+        demo_arrow_integration(conn)
+        demo_udf(conn)
+    demo_async_queries()
     demo_in_memory_vs_persistent()
     demo_concurrent_readers()
 
+    # The in-memory/persistent demo's setup statements are not recorded
+    path = os.path.join(RESULTS_DIR, "python_integration.prom")
+    query_metrics.write(path)
+    print(f"\nQuery metrics (Prometheus text format) written to {path}")
+
     print("\n" + "=" * 70)
     print("KEY TAKEAWAYS")
     print("=" * 70)
     print("""
 1. Zero-friction Pandas: Query DataFrames with SQL, no import needed
 2. Faster than Pandas: SQL on DuckDB often outperforms native Pandas
-3. Arrow support: Zero-copy data exchange with Arrow ecosystem
+3. Arrow support: Zero-copy data exchange, streamed in batches for big results
 4. UDFs: Extend SQL with Python functions
 5. Flexible modes: In-memory for speed, persistent for durability
 6. Best of both worlds: SQL power + Python ecosystem integration
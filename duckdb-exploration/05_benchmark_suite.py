@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# /// script
+# requires-python = ">=3.9"
+# dependencies = [
+#   "duckdb",
+# ]
+# ///
+"""
+Benchmark every catalogued query and flag regressions against a baseline.
+
+Each named query in queries.py (window functions, GROUPING SETS, cohort, RFM,
+the file queries from 02 and 04, ...) is timed on its own, cold and warm, with
+benchmark.py. Medians are compared with a stored baseline, and any query that
+got slower by more than the threshold is reported as a regression. The script
+exits non-zero in that case, so a DuckDB upgrade or a data-layout change that
+slows down even one query gets noticed.
+
+    uv run 05_benchmark_suite.py --update-baseline   # record a baseline
+    uv run 05_benchmark_suite.py                     # compare against it
+
+The baseline is benchmarks/baseline.json, outside the gitignored data/
+directory, so it can be committed. Updating it with --query or --group
+replaces only the entries of the queries that ran.
+
+With --profile, each query instead runs once (after a warm-up) with DuckDB's
+JSON profiler. The suite then reports the operators that took the most time
+and writes the profiles plus a flame graph input file (folded stacks) to
+data/benchmarks/profiles/.
+
+With --catalog, the queries over the transactions/customers/products views
+are timed twice instead: reading the Parquet files, and reading the native
+tables loaded into data/catalog.duckdb (see catalog.py).
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import catalog
+import connections
+import profiling
+import queries
+import rollups
+from benchmark import RESULTS_DIR, print_results, run_benchmark, write_results
+
+# Outside the gitignored data/ directory, so the baseline can be committed as the
+# regression reference (it only holds timings and the machine they came from)
+DEFAULT_BASELINE = os.path.join("benchmarks", "baseline.json")
+DEFAULT_THRESHOLD = 0.20  # Flag queries whose median grew by more than 20%
+DEFAULT_MIN_DELTA_MS = 1.0  # ...and by at least this much, to ignore sub-ms jitter
+PROFILES_DIR = os.path.join(RESULTS_DIR, "profiles")
+
+def connect_for(query, use_catalog=False):
+    """Connection factory for a query, creating the views and attachments it reads.
+
+    With `use_catalog`, the views read the native tables in the catalog
+    instead of the Parquet files.
+    """
+    def connect():
+        conn = connections.connect()
+        if query.needs_views and use_catalog:
+            catalog.attach(conn)
+        elif query.needs_views:
+            queries.setup_views(conn)
+        if query.needs_rollups:
+            rollups.attach(conn)
+        return conn
+    return connect
+
+def run_suite(selected, iterations, cold_iterations, use_catalog=False):
+    """Benchmark each selected query; returns the combined results."""
+    files = queries.DATA_FILES + [catalog.CATALOG_DB] if use_catalog else queries.DATA_FILES
+    results = []
+    for query in selected:
+        print(f"  {query.name}", flush=True)
+        results += run_benchmark(query.name, query.sql, iterations=iterations,
+                                 cold_iterations=cold_iterations, files=files,
+                                 connect=connect_for(query, use_catalog))
+    return results
+
+def print_catalog_comparison(file_results, catalog_results):
+    """Print median latency over the Parquet files vs the catalog tables."""
+    catalog_median = {(r["name"], r["mode"]): r["median_ms"] for r in catalog_results}
+    print(f"  {'query':<38} {'mode':<5} {'files':>10} {'catalog':>10} {'speedup':>8}")
+    for r in file_results:
+        native = catalog_median[(r["name"], r["mode"])]
+        print(f"  {r['name']:<38} {r['mode']:<5} {r['median_ms']:>8.2f}ms {native:>8.2f}ms "
+              f"{r['median_ms'] / native:>7.2f}x")
+
+def profile_suite(selected):
+    """Profile each selected query once, warm; returns the profiles."""
+    profiles = []
+    for query in selected:
+        conn = connect_for(query)()
+        try:
+            conn.execute(query.sql).fetchall()
+            profile = profiling.profile_query(conn, query.sql, query.name)
+        finally:
+            conn.close()
+        _, op = profiling.slowest_operator(profile)
+        print(f"  {query.name:<38} {profile['latency_seconds'] * 1000:>8.2f}ms  "
+              f"hottest: {op['name']} {op['seconds'] * 1000:.2f}ms", flush=True)
+        profiles.append(profile)
+    return profiles
+
+def write_profiles(profiles, profiles_dir=PROFILES_DIR):
+    """Write each profile as JSON and all of them as folded stacks; returns the folded path."""
+    os.makedirs(profiles_dir, exist_ok=True)
+    for profile in profiles:
+        with open(os.path.join(profiles_dir, f"{profile['name']}.json"), "w") as f:
+            json.dump(profile, f, indent=2)
+    folded_path = os.path.join(profiles_dir, "suite.folded")
+    with open(folded_path, "w") as f:
+        f.write("\n".join(profiling.folded_stacks(profiles)) + "\n")
+    return folded_path
+
+def load_baseline(path):
+    """Baseline results keyed by (name, mode), plus the machine they came from."""
+    with open(path) as f:
+        baseline = json.load(f)
+    return {(r["name"], r["mode"]): r for r in baseline["results"]}, baseline["machine"]
+
+def merge_baseline(path, results):
+    """The baseline at `path` with `results` replacing the entries of the queries that ran."""
+    if not os.path.exists(path):
+        return results
+    baseline, _ = load_baseline(path)
+    baseline.update({(r["name"], r["mode"]): r for r in results})
+    return list(baseline.values())
+
+def compare(results, baseline, threshold, min_delta_ms):
+    """Classify each result against the baseline median.
+
+    Returns (result, baseline_median_ms, ratio, status) tuples, with status one
+    of "ok", "REGRESSION", "improved" or "new".
+    """
+    rows = []
+    for r in results:
+        base = baseline.get((r["name"], r["mode"]))
+        if base is None:
+            rows.append((r, None, None, "new"))
+            continue
+        ratio = r["median_ms"] / base["median_ms"]
+        delta = r["median_ms"] - base["median_ms"]
+        if ratio > 1 + threshold and delta >= min_delta_ms:
+            status = "REGRESSION"
+        elif ratio < 1 - threshold and -delta >= min_delta_ms:
+            status = "improved"
+        else:
+            status = "ok"
+        rows.append((r, base["median_ms"], ratio, status))
+    return rows
+
+def print_comparison(rows):
+    """Print the baseline comparison as an aligned table."""
+    print(f"  {'query':<38} {'mode':<5} {'baseline':>10} {'median':>10} {'change':>8}  status")
+    for r, base, ratio, status in rows:
+        base_text = f"{base:>8.2f}ms" if base is not None else f"{'-':>10}"
+        change = f"{(ratio - 1) * 100:>+7.1f}%" if ratio is not None else f"{'-':>8}"
+        print(f"  {r['name']:<38} {r['mode']:<5} {base_text} {r['median_ms']:>8.2f}ms {change}  {status}")
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--query", action="append", metavar="NAME",
+                        help="only run this query (repeatable)")
+    parser.add_argument("--group", action="append", choices=["files", "analytics", "rollups", "python"],
+                        help="only run queries from this group (repeatable)")
+    parser.add_argument("--iterations", type=int, default=10, help="warm runs per query")
+    parser.add_argument("--cold-iterations", type=int, default=3,
+                        help="cold runs per query (0 to skip cold runs)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline results file")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="store this run as the new baseline instead of comparing; with "
+                             "--query/--group, only the queries that ran are replaced")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative median slowdown counted as a regression (default: 0.20)")
+    parser.add_argument("--min-delta-ms", type=float, default=DEFAULT_MIN_DELTA_MS,
+                        help="ignore slowdowns smaller than this many ms (default: 1.0)")
+    parser.add_argument("--profile", action="store_true",
+                        help="profile operators instead of timing (writes flame graph input)")
+    parser.add_argument("--catalog", action="store_true",
+                        help=f"compare the view-backed queries over Parquet files with the "
+                             f"native tables in {catalog.CATALOG_DB}")
+    return parser.parse_args()
+
+def main():
+    """Run the benchmark suite."""
+    args = parse_args()
+
+    unknown = set(args.query or []) - set(queries.QUERIES)
+    if unknown:
+        raise SystemExit(f"Unknown queries: {', '.join(sorted(unknown))}")
+    selected = queries.select(args.query, args.group)
+    if any(query.needs_rollups for query in selected):
+        stats = rollups.refresh()
+        print(f"Rollups refreshed: {stats['new_files']} new files merged")
+
+    if args.profile:
+        print(f"Profiling {len(selected)} queries...")
+        profiles = profile_suite(selected)
+        print("\nHottest operators across the suite (own time):")
+        profiling.print_hot_operators(profiling.hot_operators(profiles))
+        folded_path = write_profiles(profiles)
+        print(f"\nProfiles written to {PROFILES_DIR}/; flame graph input: {folded_path}")
+        print(f"  e.g. flamegraph.pl {folded_path} > suite.svg, or open it in speedscope.app")
+        return
+
+    if args.catalog:
+        selected = [query for query in selected if query.needs_views]
+        stats = catalog.refresh()
+        print(f"Catalog refreshed: {', '.join(stats['reloaded']) or 'up to date'}")
+        print(f"Benchmarking {len(selected)} view-backed queries over files, then over the catalog "
+              f"({args.cold_iterations} cold + {args.iterations} warm runs each)...")
+        file_results = run_suite(selected, args.iterations, args.cold_iterations)
+        catalog_results = run_suite(selected, args.iterations, args.cold_iterations,
+                                    use_catalog=True)
+        print("\nMedian latency, views over Parquet files vs native catalog tables:")
+        print_catalog_comparison(file_results, catalog_results)
+        path = write_results(
+            [{**r, "name": f"{r['name']}[files]"} for r in file_results]
+            + [{**r, "name": f"{r['name']}[catalog]"} for r in catalog_results],
+            "catalog_vs_files")
+        print(f"\nResults written to {path}")
+        return
+
+    print(f"Benchmarking {len(selected)} queries "
+          f"({args.cold_iterations} cold + {args.iterations} warm runs each)...")
+    results = run_suite(selected, args.iterations, args.cold_iterations)
+
+    print("\nResults:")
+    print_results(results)
+    path = write_results(results, "suite")
+    print(f"\nResults written to {path}")
+
+    if args.update_baseline:
+        if args.query or args.group:
+            results = merge_baseline(args.baseline, results)
+        results_dir, filename = os.path.split(args.baseline)
+        write_results(results, os.path.splitext(filename)[0], results_dir or ".")
+        print(f"Baseline updated: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline to record one.")
+        return
+
+    baseline, machine = load_baseline(args.baseline)
+    print(f"\nComparison with baseline from {machine['timestamp']} "
+          f"(DuckDB {machine['duckdb']}, {machine['cpu_count']} CPUs):")
+    rows = compare(results, baseline, args.threshold, args.min_delta_ms)
+    print_comparison(rows)
+
+    regressions = [r["name"] + "/" + r["mode"] for r, _, _, status in rows if status == "REGRESSION"]
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print(f"\nNo regressions over {args.threshold:.0%}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# /// script
+# requires-python = ">=3.9"
+# dependencies = [
+#   "duckdb",
+# ]
+# ///
+"""
+Run the heavy analytics queries under a memory limit and measure the cost.
+
+Each query runs in two fresh processes: one with DuckDB's defaults
+(memory_limit = 80% of RAM) and one out of core, with a tight memory_limit,
+spilling to temp_directory and preserve_insertion_order off. Each process
+runs the query --iterations times. A sampler thread polls DuckDB's memory
+use and temporary storage (spilled bytes) while the query runs, and the
+process's peak RSS is read at the end. The report shows peak RSS, peak spill
+and the runtime penalty of the limit (ratio of median runtimes), which is
+what sizing worker hosts needs.
+
+A query that runs out of memory, or whose process is killed, is reported
+with that outcome instead of a runtime, and the remaining queries still run:
+the limit where a workload stops fitting is the point of the exercise.
+
+Generate a large dataset first to see real spilling:
+
+    uv run 01_generate_data.py --scale-factor 20 --workers 4
+    uv run 06_out_of_core.py --memory-limit 500MB --threads 2
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import duckdb
+
+import connections
+import queries
+from benchmark import RESULTS_DIR, machine_info, summarize, time_query
+from queries import QUERIES
+
+DEFAULT_QUERIES = ["cohort_retention", "rfm_segments", "grouping_sets_category_region"]
+DEFAULT_ITERATIONS = 3
+SAMPLE_INTERVAL = 0.01
+
+def current_rss():
+    """Resident set size of this process in bytes (Linux), or None elsewhere."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return None
+
+def peak_rss():
+    """Highest resident set size of this process so far, in bytes."""
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+class Sampler(threading.Thread):
+    """Track peak DuckDB memory and spilled bytes while a query runs."""
+
+    def __init__(self, conn, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.conn = conn
+        self.interval = interval
+        self.peak_spill_bytes = 0
+        self.peak_memory_bytes = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            memory, spill = self.conn.execute("""
+                SELECT SUM(memory_usage_bytes), SUM(temporary_storage_bytes) FROM duckdb_memory()
+            """).fetchone()
+            self.peak_memory_bytes = max(self.peak_memory_bytes, memory or 0)
+            self.peak_spill_bytes = max(self.peak_spill_bytes, spill or 0)
+            self.stopped.wait(self.interval)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+def measure(name, mode, settings, iterations=DEFAULT_ITERATIONS):
+    """Run one query `iterations` times with `settings` in this (fresh) process.
+
+    Returns its telemetry; `outcome` is "ok", or "OOM" when DuckDB ran out of
+    memory, in which case there are no timings.
+    """
+    connections.configure(**settings)
+    conn = connections.connect()
+    queries.setup_views(conn)
+    rss_before = current_rss()
+
+    sampler = Sampler(conn.cursor())
+    sampler.start()
+    samples = []
+    error = None
+    try:
+        for _ in range(iterations):
+            samples.append(time_query(conn, QUERIES[name].sql))
+    except duckdb.OutOfMemoryException as exc:
+        error = str(exc)
+    finally:
+        sampler.stop()
+    conn.close()
+
+    result = {"name": name, "mode": mode, "settings": settings,
+              "outcome": "ok" if error is None else "OOM", "error": error}
+    if error is None:
+        result.update(summarize(name, mode, samples))
+    return {
+        **result,
+        "rss_before_bytes": rss_before,
+        "peak_rss_bytes": peak_rss(),
+        "peak_duckdb_memory_bytes": sampler.peak_memory_bytes,
+        "peak_spill_bytes": sampler.peak_spill_bytes,
+    }
+
+def measure_in_subprocess(name, mode, settings, iterations=DEFAULT_ITERATIONS):
+    """measure() in a new process, so its peak RSS belongs to this query alone.
+
+    A process killed from outside (e.g. by the kernel's OOM killer) is
+    reported with outcome "killed".
+    """
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        try:
+            return executor.submit(measure, name, mode, settings, iterations).result()
+        except BrokenProcessPool as exc:
+            return {"name": name, "mode": mode, "settings": settings, "outcome": "killed",
+                    "error": str(exc), "rss_before_bytes": None, "peak_rss_bytes": None,
+                    "peak_duckdb_memory_bytes": None, "peak_spill_bytes": None}
+
+def mb(num_bytes):
+    """Bytes as megabytes, for the report."""
+    return f"{num_bytes / 1024**2:>8.1f}MB" if num_bytes is not None else f"{'-':>10}"
+
+def penalty(default, limited):
+    """Median runtime out of core relative to the default run, or None if either failed."""
+    if default["outcome"] != "ok" or limited["outcome"] != "ok":
+        return None
+    return limited["median_ms"] / default["median_ms"]
+
+def print_report(pairs):
+    """Print default vs out-of-core telemetry per query."""
+    print(f"  {'query':<32} {'mode':<12} {'median':>9} {'peak RSS':>10} {'DuckDB mem':>10} "
+          f"{'spilled':>10} {'penalty':>8}")
+    for default, limited in pairs:
+        ratio = penalty(default, limited)
+        for r in (default, limited):
+            time_text = (f"{r['median_ms']:>7.0f}ms" if r["outcome"] == "ok"
+                         else f"{r['outcome']:>9}")
+            penalty_text = (f"{ratio:>7.2f}x" if r is limited and ratio is not None
+                            else f"{'':>8}")
+            print(f"  {r['name']:<32} {r['mode']:<12} {time_text} "
+                  f"{mb(r['peak_rss_bytes'])} {mb(r['peak_duckdb_memory_bytes'])} "
+                  f"{mb(r['peak_spill_bytes'])} {penalty_text}")
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--query", action="append", metavar="NAME",
+                        help=f"query to run (repeatable; default: {', '.join(DEFAULT_QUERIES)})")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS,
+                        help=f"timed runs per query and mode; the report uses the median "
+                             f"(default: {DEFAULT_ITERATIONS})")
+    parser.add_argument("--memory-limit", default="256MB",
+                        help="DuckDB memory_limit for the out-of-core runs (default: 256MB)")
+    parser.add_argument("--threads", type=int,
+                        help="DuckDB threads for both runs (default: all cores); "
+                             "each thread needs its own working memory")
+    parser.add_argument("--temp-directory", default=connections.TEMP_DIRECTORY,
+                        help=f"where out-of-core runs spill (default: {connections.TEMP_DIRECTORY})")
+    parser.add_argument("--max-temp-directory-size",
+                        help="cap on spilled bytes, e.g. 20GB (default: 90%% of free disk)")
+    args = parser.parse_args()
+    if args.iterations < 1:
+        parser.error("--iterations must be at least 1")
+    return args
+
+def main():
+    """Measure each query with and without a memory limit."""
+    args = parse_args()
+    names = args.query or DEFAULT_QUERIES
+    unknown = set(names) - set(QUERIES)
+    if unknown:
+        raise SystemExit(f"Unknown queries: {', '.join(sorted(unknown))}")
+
+    default = {"threads": args.threads}
+    limited = {
+        "threads": args.threads,
+        "memory_limit": args.memory_limit,
+        "temp_directory": args.temp_directory,
+        "preserve_insertion_order": False,
+        "max_temp_directory_size": args.max_temp_directory_size,
+    }
+
+    print(f"Out-of-core runs: memory_limit={args.memory_limit}, spilling to {args.temp_directory}, "
+          f"preserve_insertion_order=false, threads={args.threads or 'all'}\n")
+    pairs = []
+    for name in names:
+        print(f"  {name}", flush=True)
+        pairs.append((measure_in_subprocess(name, "default", default, args.iterations),
+                      measure_in_subprocess(name, "out-of-core", limited, args.iterations)))
+
+    print("\nResults (peak RSS is the whole process, including Python and pyarrow):")
+    print_report(pairs)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, "out_of_core.json")
+    with open(path, "w") as f:
+        json.dump({"machine": machine_info(),
+                   "iterations": args.iterations,
+                   "results": [{**run, "penalty": penalty(*pair) if run is pair[1] else None}
+                               for pair in pairs for run in pair]}, f, indent=2)
+    print(f"\nResults written to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Asyncio API for the named queries, for serving them from an async web service.
+
+DuckDB calls block, so AsyncQueryRunner runs every step of a query (executing
+it, fetching each Arrow batch) on its own worker threads. The event loop keeps
+serving other requests while a 300 ms cohort query runs.
+
+- Concurrency is bounded: at most `max_concurrency` queries run at once, each
+  on a cursor of the runner's ConnectionPool; further callers wait their turn.
+- Timeouts and cancellation interrupt the query inside DuckDB, so an abandoned
+  request stops using CPU instead of running to completion in the background.
+- Results stream back as pyarrow RecordBatches of `batch_size` rows.
+
+    async with AsyncQueryRunner(max_concurrency=4, timeout=5) as runner:
+        async for batch in runner.stream("rfm_segments"):
+            ...
+        table = await runner.fetch_arrow("monthly_revenue")
+"""
+
+import asyncio
+import contextlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import connections
+import queries
+import rollups
+from queries import QUERIES
+
+DEFAULT_BATCH_SIZE = 10_000
+
+def read_next_batch(reader):
+    """Next batch from a RecordBatchReader, or None when it is exhausted.
+
+    StopIteration can't be passed back through a Future, hence the None.
+    """
+    try:
+        return reader.read_next_batch()
+    except StopIteration:
+        return None
+
+class AsyncQueryRunner:
+    """Run catalog queries off the event loop with bounded concurrency and timeouts."""
+
+    def __init__(self, max_concurrency=4, timeout=None, batch_size=DEFAULT_BATCH_SIZE,
+                 attach_rollups=False, metrics=None):
+        def setup(conn):
+            queries.setup_views(conn)
+            if attach_rollups:
+                rollups.attach(conn)
+
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.metrics = metrics  # Optional metrics.QueryMetrics recording every query
+        self.pool = connections.ConnectionPool(size=max_concurrency, setup=setup)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency,
+                                            thread_name_prefix="duckdb-query")
+        self._slots = None  # Semaphore of the loop in _slots_loop, see _semaphore()
+        self._slots_loop = None
+
+    def _semaphore(self):
+        """Semaphore bounding concurrent queries, created in the running event loop.
+
+        On Python 3.9 a semaphore binds to the loop current when it is created,
+        so creating it in __init__ (outside asyncio.run()) would bind the wrong one.
+        """
+        loop = asyncio.get_running_loop()
+        if self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+            self._slots_loop = loop
+        return self._slots
+
+    async def _call(self, conn, deadline, fn, *args):
+        """Run fn(*args) on a worker thread, interrupting `conn` on timeout or cancellation."""
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, fn, *args)
+        remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), remaining)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            conn.interrupt()
+            # Let the worker notice the interrupt before the cursor is closed
+            await asyncio.wait([future])
+            future.exception()  # retrieved, so asyncio doesn't log it as unhandled
+            raise
+
+    @contextlib.asynccontextmanager
+    async def _checkout(self, name, timeout):
+        """Wait for a free slot, then yield (query, cursor, deadline) for one run."""
+        query = QUERIES[name]
+        timeout = self.timeout if timeout is None else timeout
+        async with self._semaphore():
+            deadline = None if timeout is None else time.monotonic() + timeout
+            # The semaphore matches the pool size, so a cursor is always free here
+            with self.pool.connection(timeout=0) as conn:
+                try:
+                    yield query, conn, deadline
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"Query {name!r} exceeded its {timeout}s timeout") from None
+
+    async def stream(self, name, timeout=None, batch_size=None):
+        """Yield the results of a named query as pyarrow RecordBatches.
+
+        `timeout` (default: the runner's) covers the whole query, including
+        the time the caller spends between batches.
+        """
+        batch_size = batch_size or self.batch_size
+        measure = (self.metrics.measure(name) if self.metrics is not None
+                   else contextlib.nullcontext({"rows": 0}))
+        async with self._checkout(name, timeout) as (query, conn, deadline):
+            with measure as run:
+                reader = await self._call(
+                    conn, deadline, lambda: conn.execute(query.sql).to_arrow_reader(batch_size))
+                while True:
+                    batch = await self._call(conn, deadline, read_next_batch, reader)
+                    if batch is None:
+                        return
+                    run["rows"] += batch.num_rows
+                    yield batch
+
+    async def fetch_arrow(self, name, timeout=None):
+        """Results of a named query as one pyarrow Table."""
+        async with self._checkout(name, timeout) as (query, conn, deadline):
+            if self.metrics is not None:
+                return await self._call(conn, deadline, self.metrics.execute, conn, query.sql, name)
+            return await self._call(conn, deadline,
+                                    lambda: conn.execute(query.sql).to_arrow_table())
+
+    async def fetch_many(self, names, timeout=None):
+        """Run several named queries concurrently.
+
+        Returns a (name, Table or exception) pair per query, in the order of
+        `names`; a name listed twice is run twice.
+        """
+        results = await asyncio.gather(*(self.fetch_arrow(name, timeout) for name in names),
+                                       return_exceptions=True)
+        return list(zip(names, results))
+
+    def close(self):
+        """Stop the worker threads and close the pool."""
+        self._executor.shutdown(wait=True)
+        self.pool.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
@@ -0,0 +1,142 @@
+"""
+Benchmark harness for DuckDB queries.
+
+Every timed run executes the query to completion and fetches all result rows,
+so lazy relations can't make a query look free. Runs are split into:
+- cold: a fresh connection, with the source files evicted from the OS page cache
+- warm: one connection, reused after warm-up runs
+
+Each mode reports median, p95 and standard deviation. Results are written as
+JSON and CSV together with a description of the machine, so numbers from
+different machines can be compared.
+"""
+
+import csv
+import glob
+import json
+import os
+import platform
+import statistics
+import time
+from datetime import datetime, timezone
+
+import duckdb
+
+import connections
+
+RESULTS_DIR = os.path.join("data", "benchmarks")
+
+RESULT_FIELDS = ["name", "mode", "iterations", "median_ms", "p95_ms", "stddev_ms",
+                 "mean_ms", "min_ms", "max_ms"]
+
+def evict_from_page_cache(patterns):
+    """Ask the OS to drop cached pages for every file matching `patterns`.
+
+    Returns False where posix_fadvise is unavailable (e.g. macOS); cold runs
+    then only start from a fresh DuckDB connection.
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    for pattern in patterns:
+        for path in glob.glob(pattern, recursive=True):
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+    return True
+
+def time_query(conn, sql):
+    """Run `sql` to completion, fetching every row, and return elapsed seconds."""
+    start = time.perf_counter()
+    conn.execute(sql).fetchall()
+    return time.perf_counter() - start
+
+def percentile(samples, pct):
+    """Linearly interpolated percentile (0-100) of a list of samples."""
+    ordered = sorted(samples)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+def summarize(name, mode, samples):
+    """Summary statistics for one benchmark mode, in milliseconds."""
+    ms = [s * 1000 for s in samples]
+    return {
+        "name": name,
+        "mode": mode,
+        "iterations": len(ms),
+        "median_ms": statistics.median(ms),
+        "p95_ms": percentile(ms, 95),
+        "stddev_ms": statistics.stdev(ms) if len(ms) > 1 else 0.0,
+        "mean_ms": statistics.mean(ms),
+        "min_ms": min(ms),
+        "max_ms": max(ms),
+        "samples_ms": ms,
+    }
+
+def run_benchmark(name, sql, iterations=10, warmup=1, cold_iterations=5, files=(),
+                  connect=connections.connect):
+    """Benchmark one query cold and warm; returns one result dict per mode.
+
+    `files` are glob patterns of the query's source files, evicted from the
+    page cache before every cold run. `connect` opens a new connection
+    (by default a standalone one with the shared connections.SETTINGS).
+    """
+    results = []
+
+    if cold_iterations:
+        samples = []
+        for _ in range(cold_iterations):
+            evict_from_page_cache(files)
+            conn = connect()
+            try:
+                samples.append(time_query(conn, sql))
+            finally:
+                conn.close()
+        results.append(summarize(name, "cold", samples))
+
+    conn = connect()
+    try:
+        for _ in range(warmup):
+            time_query(conn, sql)
+        samples = [time_query(conn, sql) for _ in range(iterations)]
+    finally:
+        conn.close()
+    results.append(summarize(name, "warm", samples))
+
+    return results
+
+def machine_info():
+    """Describe the machine and library versions a benchmark ran on."""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "duckdb": duckdb.__version__,
+        "page_cache_eviction": hasattr(os, "posix_fadvise"),
+    }
+
+def write_results(results, name, results_dir=RESULTS_DIR):
+    """Write results to <results_dir>/<name>.json and .csv; returns the JSON path."""
+    os.makedirs(results_dir, exist_ok=True)
+    json_path = os.path.join(results_dir, f"{name}.json")
+    with open(json_path, "w") as f:
+        json.dump({"machine": machine_info(), "results": results}, f, indent=2)
+
+    with open(os.path.join(results_dir, f"{name}.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(results)
+
+    return json_path
+
+def print_results(results):
+    """Print results as an aligned table."""
+    print(f"  {'query':<38} {'mode':<5} {'n':>3} {'median':>10} {'p95':>10} {'stddev':>10}")
+    for r in results:
+        print(f"  {r['name']:<38} {r['mode']:<5} {r['iterations']:>3} "
+              f"{r['median_ms']:>8.2f}ms {r['p95_ms']:>8.2f}ms {r['stddev_ms']:>8.2f}ms")
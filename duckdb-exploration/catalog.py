@@ -0,0 +1,94 @@
+"""
+Persistent catalog of the source tables, kept in data/catalog.duckdb.
+
+The transactions/customers/products views in queries.py read the Parquet
+files on every query: each scan opens the files and reads their footers, and
+each new connection binds the views against the files again. The catalog
+loads those tables once into DuckDB's native storage instead, where every
+column gets zonemaps (min/max per row group) and statistics the optimizer
+uses. Transactions are stored sorted by date, so date filters skip most of
+the table.
+
+refresh() reloads a table only when the files behind it changed (by path,
+size and mtime), so calling it on every run is cheap. attach() then points
+the views at the native tables, and the queries run unchanged:
+
+    catalog.refresh()
+    with connections.get_pool().connection() as conn:
+        catalog.attach(conn)
+"""
+
+import glob
+import os
+import time
+from collections import defaultdict
+
+import connections
+import queries
+from rollups import file_states
+
+CATALOG_DB = os.path.join("data", "catalog.duckdb")
+
+# Load order of each table; the sort key is what its zonemaps can prune on
+SORT_KEYS = {
+    "transactions": "transaction_date, customer_id",
+    "customers": "customer_id",
+    "products": "product_id",
+}
+
+SCHEMA_SQL = """
+    -- Files each table was loaded from, to notice when it is out of date
+    CREATE TABLE IF NOT EXISTS catalog.source_files (
+        table_name VARCHAR,
+        path VARCHAR,
+        size BIGINT,
+        mtime DOUBLE,
+        PRIMARY KEY (table_name, path)
+    );
+"""
+
+def refresh(db_path=CATALOG_DB, rebuild=False):
+    """Reload every table whose source files changed since it was loaded.
+
+    Returns a summary dict: the tables reloaded, their row counts and the time
+    taken.
+    """
+    start = time.perf_counter()
+    conn = connections.connect()
+    try:
+        # The file-backed views define each table's columns and ENUM types
+        queries.setup_views(conn)
+        conn.execute(f"ATTACH '{db_path}' AS catalog")
+        conn.execute(SCHEMA_SQL)
+        loaded = defaultdict(dict)
+        for table, path, size, mtime in conn.execute(
+                "SELECT table_name, path, size, mtime FROM catalog.source_files").fetchall():
+            loaded[table][path] = (size, mtime)
+
+        reloaded = {}
+        conn.begin()
+        for table, pattern in queries.VIEW_FILES.items():
+            current = file_states(sorted(glob.glob(pattern)))
+            if current == loaded[table] and not rebuild:
+                continue
+            conn.execute(f"CREATE OR REPLACE TABLE catalog.{table} AS "
+                         f"SELECT * FROM {table} ORDER BY {SORT_KEYS[table]}")
+            conn.execute("DELETE FROM catalog.source_files WHERE table_name = ?", [table])
+            conn.executemany("INSERT INTO catalog.source_files VALUES (?, ?, ?, ?)",
+                             [(table, path, *state) for path, state in current.items()])
+            reloaded[table] = conn.execute(f"SELECT COUNT(*) FROM catalog.{table}").fetchone()[0]
+        conn.commit()
+    finally:
+        conn.close()
+
+    return {"reloaded": reloaded, "seconds": time.perf_counter() - start}
+
+def attach(conn, db_path=CATALOG_DB):
+    """Attach the catalog read-only and point the source views at its tables.
+
+    Views are shared by every cursor of a database, so on a pooled connection
+    this switches the whole pool over.
+    """
+    conn.execute(f"ATTACH IF NOT EXISTS '{db_path}' AS catalog (READ_ONLY)")
+    for table in queries.VIEW_FILES:
+        conn.execute(f"CREATE OR REPLACE VIEW {table} AS SELECT * FROM catalog.{table}")
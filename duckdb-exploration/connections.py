@@ -0,0 +1,110 @@
+"""
+Shared DuckDB connections for the scripts and for services embedding the queries.
+
+Every database the scripts open is configured the same way, from SETTINGS:
+threads, memory_limit and the temp_directory larger-than-memory operators
+spill to (see 06_out_of_core.py), with Parquet footer caching switched on.
+
+A ConnectionPool owns one such database, with the catalog views created once.
+The connections it hands out are cursors on that database: they share its
+views, ENUM types, attached databases, buffer pool and cached Parquet
+metadata, but each runs its own queries, so concurrent requests don't reopen
+the data files or re-read their footers on every call.
+
+    with connections.get_pool().connection() as conn:
+        conn.sql("SELECT COUNT(*) FROM transactions").show()
+"""
+
+import contextlib
+import os
+import queue
+import threading
+
+import duckdb
+
+import queries
+
+TEMP_DIRECTORY = os.path.join("data", "tmp")
+
+# Applied to every connection opened through this module; None keeps DuckDB's
+# default (all cores for threads, 80% of RAM for memory_limit, insertion order
+# preserved, temp files up to 90% of free disk space).
+SETTINGS = {
+    "threads": None,
+    "memory_limit": None,
+    "temp_directory": TEMP_DIRECTORY,
+    "preserve_insertion_order": None,
+    "max_temp_directory_size": None,
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def configure(**settings):
+    """Change SETTINGS for connections opened from now on (e.g. memory_limit="4GB")."""
+    unknown = set(settings) - set(SETTINGS)
+    if unknown:
+        raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+    SETTINGS.update(settings)
+
+def connect(database=":memory:", read_only=False):
+    """Open a standalone connection with the shared settings."""
+    config = {name: value for name, value in SETTINGS.items() if value is not None}
+    conn = duckdb.connect(database, read_only=read_only, config=config)
+    # Keep Parquet footers in memory, so repeated scans skip parsing them
+    conn.execute("SET parquet_metadata_cache = true")
+    return conn
+
+class ConnectionPool:
+    """Hand out cursors on one shared, configured database.
+
+    At most `size` connections are checked out at once; callers beyond that
+    wait for one to be returned. `setup` runs once on the database, e.g. to
+    create views.
+    """
+
+    def __init__(self, database=":memory:", size=None, setup=None):
+        self.database = connect(database)
+        if setup:
+            setup(self.database)
+        self.size = size or os.cpu_count()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._idle = queue.LifoQueue()
+
+    @contextlib.contextmanager
+    def connection(self, timeout=None):
+        """Check out a connection for the duration of a `with` block.
+
+        Raises TimeoutError if none becomes free within `timeout` seconds. A
+        connection that raised is closed instead of being reused, so a failed
+        transaction never leaks into the next caller.
+        """
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError(f"No free connection within {timeout}s (pool size {self.size})")
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self.database.cursor()
+            try:
+                yield conn
+            except BaseException:
+                conn.close()
+                raise
+            self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Close idle connections and the database."""
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
+        self.database.close()
+
+def get_pool():
+    """The process-wide pool, with the transactions/customers/products views."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(setup=queries.setup_views)
+    return _pool
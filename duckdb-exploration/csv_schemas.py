@@ -0,0 +1,140 @@
+"""
+Registry of sniffed CSV dialects and column types, kept in data/csv_schemas.json.
+
+Reading a CSV with auto-detection (`FROM 'x.csv'`, `read_csv_auto`) samples
+and sniffs the file on every query to work out the delimiter, quoting, header
+and column types. The registry sniffs each file once with `sniff_csv` and
+records the result under the file's size and mtime. Later reads pass the
+recorded dialect and `columns=` explicitly with `auto_detect=false`, so
+DuckDB goes straight to parsing. A file is sniffed again only when it changes.
+
+rewrite() turns the CSV references in a query into such explicit reads:
+
+    registry = CsvSchemaRegistry()
+    conn.sql(registry.rewrite(conn, "SELECT COUNT(*) FROM 'data/customers.csv'"))
+
+Files matched by one glob whose schemas differ (e.g. 'data/*.csv') are read
+separately and combined with UNION ALL BY NAME.
+"""
+
+import glob
+import json
+import os
+import re
+import threading
+
+from file_lru import temp_path
+from schema import quote
+
+REGISTRY_PATH = os.path.join("data", "csv_schemas.json")
+
+# read_csv('x.csv', ...) / read_csv_auto('x.csv', ...) calls, and bare 'x.csv'
+# table references after FROM or JOIN
+READ_CSV_CALL = re.compile(r"\bread_csv(?:_auto)?\(\s*'([^']+)'\s*((?:,[^()]*)?)\)", re.IGNORECASE)
+CSV_TABLE = re.compile(r"\b(FROM|JOIN)\s+'([^']+\.csv)'", re.IGNORECASE)
+
+def sniff(conn, path):
+    """Dialect and columns of a CSV file, detected by DuckDB's sniffer."""
+    row = conn.execute("""
+        SELECT Delimiter, Quote, Escape, NewLineDelimiter, Comment, SkipRows, HasHeader,
+               Columns, DateFormat, TimestampFormat
+        FROM sniff_csv(?)
+    """, [path]).fetchone()
+    delim, quote_char, escape, new_line, comment, skip, header, columns, dateformat, timestampformat = row
+    # The sniffer reports a character it didn't find (e.g. no escape) as "(empty)"
+    dialect = {
+        "delim": delim,
+        "quote": quote_char,
+        "escape": escape,
+        "new_line": new_line,
+        "comment": comment,
+        "skip": skip,
+        "header": header,
+    }
+    dialect = {name: "" if value == "(empty)" else value for name, value in dialect.items()}
+    if dateformat:
+        dialect["dateformat"] = dateformat
+    if timestampformat:
+        dialect["timestampformat"] = timestampformat
+    return {"dialect": dialect, "columns": [[col["name"], col["type"]] for col in columns]}
+
+def sql_value(value):
+    """SQL literal of a read_csv option value."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return str(value)
+    return quote(value)
+
+def read_csv_sql(files, schema, extra_options=""):
+    """read_csv() call over `files` that all share `schema`, with auto-detection off."""
+    options = ["auto_detect=false"]
+    options += [f"{name}={sql_value(value)}" for name, value in schema["dialect"].items()]
+    columns = ", ".join(f"{quote(name)}: {quote(sql_type)}" for name, sql_type in schema["columns"])
+    options.append(f"columns={{{columns}}}")
+    file_list = "[" + ", ".join(map(quote, files)) + "]"
+    return f"read_csv({file_list}, {', '.join(options)}{extra_options})"
+
+class CsvSchemaRegistry:
+    """Sniff each CSV file once per version and reuse its schema for explicit reads."""
+
+    def __init__(self, path=REGISTRY_PATH):
+        self.path = path
+        self.sniffs = 0
+        self.hits = 0
+        self._lock = threading.Lock()
+        try:
+            with open(path) as f:
+                self._schemas = json.load(f)
+        except FileNotFoundError:
+            self._schemas = {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = temp_path(self.path)
+        with open(tmp_path, "w") as f:
+            json.dump(self._schemas, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def schema(self, conn, path):
+        """Recorded schema of a CSV file, sniffed with `conn` if the file is new or changed."""
+        stat = os.stat(path)
+        fingerprint = [stat.st_size, stat.st_mtime_ns]
+        with self._lock:
+            entry = self._schemas.get(path)
+            if entry is not None and entry["fingerprint"] == fingerprint:
+                self.hits += 1
+                return entry
+        entry = {"fingerprint": fingerprint, **sniff(conn, path)}
+        with self._lock:
+            self.sniffs += 1
+            self._schemas[path] = entry
+            self._save()
+        return entry
+
+    def read_sql(self, conn, pattern, extra_options=""):
+        """Table expression reading the CSV files matching `pattern` with explicit schemas.
+
+        `extra_options` (e.g. ", filename=true") is appended to every read_csv call.
+        """
+        files = sorted(glob.glob(pattern))
+        if not files:
+            raise FileNotFoundError(f"No CSV files match {pattern}")
+        groups = {}  # schema -> files sharing it
+        for path in files:
+            entry = self.schema(conn, path)
+            key = json.dumps({"dialect": entry["dialect"], "columns": entry["columns"]}, sort_keys=True)
+            groups.setdefault(key, []).append(path)
+        reads = [read_csv_sql(paths, json.loads(key), extra_options) for key, paths in groups.items()]
+        if len(reads) == 1:
+            return reads[0]
+        return "(" + " UNION ALL BY NAME ".join(f"SELECT * FROM {read}" for read in reads) + ")"
+
+    def rewrite(self, conn, sql):
+        """`sql` with its CSV reads replaced by reads with the recorded schemas."""
+        sql = READ_CSV_CALL.sub(lambda m: self.read_sql(conn, m.group(1), m.group(2)), sql)
+        return CSV_TABLE.sub(lambda m: f"{m.group(1)} {self.read_sql(conn, m.group(2))}", sql)
+
+    def stats(self):
+        """Sniff/hit counters and the number of files recorded."""
+        return {"sniffs": self.sniffs, "hits": self.hits, "files": len(self._schemas)}
@@ -0,0 +1,70 @@
+"""
+Directories of cached files evicted least recently used first.
+
+ResultCache (result_cache.py) and ParquetShadowCache (parquet_shadows.py)
+both keep one file per entry and use each file's mtime as its last use: a
+hit touches the file, and evict() deletes the oldest files until the
+directory fits its size and count limits. New entries are written under
+temp_path() and renamed into place with os.replace(), so a concurrent reader
+never sees a partly written file.
+"""
+
+import glob
+import os
+import threading
+
+def temp_path(path):
+    """Temporary name next to `path`, unique to this process and thread.
+
+    Write the file there, then os.replace() it onto `path`.
+    """
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+class FileLRU:
+    """The `*{suffix}` files in a directory, kept within `max_bytes` and `max_entries`."""
+
+    def __init__(self, directory, suffix, max_bytes, max_entries=None):
+        self.directory = directory
+        self.suffix = suffix
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+
+    def entries(self):
+        """(path, size, last_used) of every entry, least recently used first."""
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, f"*{self.suffix}")):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def evict(self, keep=None):
+        """Delete least recently used entries, other than `keep`, until the limits are met."""
+        entries = [entry for entry in self.entries() if entry[0] != keep]
+        total = sum(size for _, size, _ in entries)
+        count = len(entries)
+        if keep is not None and os.path.exists(keep):
+            total += os.path.getsize(keep)
+            count += 1
+        while entries and (total > self.max_bytes or
+                           (self.max_entries is not None and count > self.max_entries)):
+            path, size, _ = entries.pop(0)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            count -= 1
+
+    def clear(self):
+        """Delete every entry."""
+        for path, _, _ in self.entries():
+            os.remove(path)
+
+    def usage(self):
+        """Number of entries and their total size on disk."""
+        entries = self.entries()
+        return {"entries": len(entries), "bytes": sum(size for _, size, _ in entries)}
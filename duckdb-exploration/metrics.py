@@ -0,0 +1,220 @@
+"""
+Query metrics in the Prometheus text exposition format.
+
+QueryMetrics.execute() wraps a query execution and records, per query name
+(measure() and stream() do the same for queries it can't run itself, such as
+ones over the caller's DataFrames and streamed results):
+- duckdb_query_duration_seconds: latency histogram
+- duckdb_query_rows_returned_total: rows returned
+- duckdb_query_rows_scanned_total: rows read by table scans, from DuckDB's
+  JSON profiler. Only recorded with QueryMetrics(profile=True) (03's
+  --metrics-rows-scanned), since the profiler adds its own overhead to every
+  query it measures.
+- duckdb_query_read_bytes_total: bytes the process read while the query ran
+  (rchar from /proc/self/io, Linux only). DuckDB's profiler doesn't count
+  bytes read from Parquet/CSV files, so this is measured at the OS level. It
+  is exact when queries run one at a time; concurrent queries share the count.
+- duckdb_query_errors_total
+- duckdb_result_cache_requests_total{result="hit"|"miss"}, recorded by
+  result_cache.ResultCache when it is given a QueryMetrics. Cache hits also
+  record their latency and rows returned, labelled cache="hit".
+
+render() returns the metrics as text, write() saves them for node_exporter's
+textfile collector, and serve() exposes them on http://HOST:PORT/metrics.
+"""
+
+import contextlib
+import os
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import profiling
+from file_lru import temp_path
+
+# Latency buckets in seconds, from sub-millisecond lookups to multi-second scans
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+COUNTERS = {
+    "duckdb_query_rows_scanned_total": "Rows read by table scans.",
+    "duckdb_query_rows_returned_total": "Rows returned to the caller.",
+    "duckdb_query_read_bytes_total": ("Bytes read by the whole process (rchar) while the query "
+                                      "ran; not per file, and shared by concurrent queries."),
+    "duckdb_query_errors_total": "Queries that raised an error.",
+    "duckdb_result_cache_requests_total": "Result cache lookups by outcome.",
+}
+DURATION = "duckdb_query_duration_seconds"
+
+def read_bytes():
+    """Bytes this process has read so far (Linux), or None elsewhere."""
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("rchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def escape(value):
+    """Label value with backslashes, quotes and newlines escaped."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(labels):
+    """Prometheus label set, e.g. {query="rfm_segments"}."""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels) + "}"
+
+def format_value(value):
+    """Sample value; integers without a decimal point."""
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class QueryMetrics:
+    """Thread-safe registry of per-query counters and latency histograms."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, profile=False):
+        self.buckets = tuple(sorted(buckets))
+        self.profile = profile
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)  # (metric, labels) -> value
+        self._histograms = {}  # labels -> [bucket counts..., sum, count]
+
+    def inc(self, metric, labels, amount=1):
+        """Add to a counter."""
+        with self._lock:
+            self._counters[(metric, labels)] += amount
+
+    def observe(self, labels, seconds):
+        """Record one latency sample."""
+        with self._lock:
+            histogram = self._histograms.setdefault(labels, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram[i] += 1
+            histogram[-2] += seconds
+            histogram[-1] += 1
+
+    @contextlib.contextmanager
+    def measure(self, name, labels=()):
+        """Record the query `name` run inside the block.
+
+        Yields a dict; set or add to its "rows" the number of rows returned.
+        For queries that can't go through execute(), e.g. ones reading a
+        DataFrame from the caller's variables, or relations built with the
+        relational API. `labels` are extra (label, value) pairs, e.g.
+        (("mode", "parallel"),), to tell runs of the same query apart.
+        """
+        labels = (("query", name),) + tuple(labels)
+        run = {"rows": 0}
+        bytes_before = read_bytes()
+        start = time.perf_counter()
+        try:
+            yield run
+        except Exception:
+            self.inc("duckdb_query_errors_total", labels)
+            raise
+        finally:
+            self.observe(labels, time.perf_counter() - start)
+            bytes_after = read_bytes()
+            self.inc("duckdb_query_rows_returned_total", labels, run["rows"])
+            if bytes_before is not None:
+                self.inc("duckdb_query_read_bytes_total", labels, bytes_after - bytes_before)
+
+    def execute(self, conn, sql, name, fetch="to_arrow_table", labels=()):
+        """Run `sql` on `conn` as query `name`, recording its metrics.
+
+        Returns the result fetched with the `fetch` method of the executed
+        cursor: a pyarrow Table by default, or e.g. "df" or "fetchall".
+        `labels` are extra labels, as for measure().
+        """
+        profiler = profiling.json_profiling(conn) if self.profile else contextlib.nullcontext({})
+        with profiler as raw:
+            with self.measure(name, labels) as run:
+                result = getattr(conn.execute(sql), fetch)()
+                run["rows"] = len(result)
+        if self.profile:
+            self.inc("duckdb_query_rows_scanned_total", (("query", name),) + tuple(labels),
+                     raw.get("cumulative_rows_scanned", 0))
+        return result
+
+    def stream(self, batches, name):
+        """Pass RecordBatches through, recording query `name` as they are consumed.
+
+        Its latency runs until the last batch is consumed (or the stream is
+        closed), so it includes the time the consumer spends on each batch.
+        """
+        with self.measure(name) as run:
+            for batch in batches:
+                run["rows"] += batch.num_rows
+                yield batch
+
+    def record_cache(self, name, hit, seconds=None, rows=0):
+        """Count a result cache lookup.
+
+        For a hit, `seconds` and `rows` (the lookup's time and the cached
+        result's size) are recorded like an execution, labelled cache="hit"
+        so they don't blend into the latency of executed queries.
+        """
+        self.inc("duckdb_result_cache_requests_total",
+                 (("query", name), ("result", "hit" if hit else "miss")))
+        if hit and seconds is not None:
+            labels = (("query", name), ("cache", "hit"))
+            self.observe(labels, seconds)
+            self.inc("duckdb_query_rows_returned_total", labels, rows)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {labels: list(values) for labels, values in self._histograms.items()}
+
+        lines = [f"# HELP {DURATION} Query latency.", f"# TYPE {DURATION} histogram"]
+        for labels, values in sorted(histograms.items()):
+            for bound, count in zip(self.buckets, values):
+                lines.append(f"{DURATION}_bucket{format_labels(labels + (('le', repr(bound)),))} {count}")
+            lines.append(f"{DURATION}_bucket{format_labels(labels + (('le', '+Inf'),))} {values[-1]}")
+            lines.append(f"{DURATION}_sum{format_labels(labels)} {format_value(values[-2])}")
+            lines.append(f"{DURATION}_count{format_labels(labels)} {values[-1]}")
+
+        for metric, help_text in COUNTERS.items():
+            samples = sorted((labels, value) for (name, labels), value in counters.items()
+                             if name == metric)
+            if not samples:
+                continue
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+            lines += [f"{metric}{format_labels(labels)} {format_value(value)}"
+                      for labels, value in samples]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write the metrics to a file atomically (e.g. for node_exporter's textfile collector)."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = temp_path(path)
+        with open(tmp_path, "w") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def serve(self, port=9464, host="127.0.0.1"):
+        """Serve the metrics at http://host:port/metrics from a background thread; returns the server."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
@@ -0,0 +1,87 @@
+"""
+Run a batch of independent queries concurrently on one database.
+
+A dashboard page fires a couple of dozen analytical queries at once. Each
+worker thread checks out its own cursor from a connections.ConnectionPool, so
+the queries share the views and cached file metadata but execute side by
+side; DuckDB schedules their tasks on its shared thread pool.
+
+For every query the batch records the queueing delay (from submitting the
+batch until the query started on a cursor) and its run time. Running the same
+batch with one worker gives the sequential baseline to compare against.
+"""
+
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+def run_query(pool, query, submitted, metrics=None, labels=()):
+    """Run one query to completion on a pooled cursor; returns its timings.
+
+    `metrics` is an optional metrics.QueryMetrics to record the query in,
+    with the extra metric `labels`.
+    """
+    with pool.connection() as conn:
+        started = time.perf_counter()
+        if metrics is not None:
+            rows = len(metrics.execute(conn, query.sql, query.name, fetch="fetchall",
+                                        labels=labels))
+        else:
+            rows = len(conn.execute(query.sql).fetchall())
+        finished = time.perf_counter()
+    return {
+        "name": query.name,
+        "rows": rows,
+        "queued_ms": (started - submitted) * 1000,
+        "run_ms": (finished - started) * 1000,
+    }
+
+def run_batch(pool, queries, workers, metrics=None, labels=()):
+    """Run `queries` on `workers` threads; returns (per-query timings, wall seconds).
+
+    Workers beyond the pool size wait for a free cursor, which shows up as
+    queueing delay.
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_query, pool, query, start, metrics, labels)
+                   for query in queries]
+        timings = [future.result() for future in futures]
+    return timings, time.perf_counter() - start
+
+def compare_sequential_parallel(pool, queries, workers, warmup=True, metrics=None):
+    """Run the batch sequentially and then on `workers` threads.
+
+    A warm-up pass first reads every file once, so neither run pays for a
+    cold cache; it isn't recorded in `metrics`, where the two runs are told
+    apart by a mode="sequential"/"parallel" label. Returns a summary dict
+    with both runs' timings.
+    """
+    if warmup:
+        run_batch(pool, queries, 1)
+    sequential, sequential_s = run_batch(pool, queries, 1, metrics, (("mode", "sequential"),))
+    parallel, parallel_s = run_batch(pool, queries, workers, metrics, (("mode", "parallel"),))
+    return {
+        "workers": workers,
+        "sequential": sequential,
+        "sequential_s": sequential_s,
+        "parallel": parallel,
+        "parallel_s": parallel_s,
+        "speedup": sequential_s / parallel_s,
+    }
+
+def print_report(summary):
+    """Print per-query timings of both runs, then the wall-clock comparison."""
+    print(f"  {'query':<38} {'seq queued':>11} {'seq run':>9} {'par queued':>11} {'par run':>9}")
+    for seq, par in zip(summary["sequential"], summary["parallel"]):
+        print(f"  {seq['name']:<38} {seq['queued_ms']:>9.1f}ms {seq['run_ms']:>7.1f}ms "
+              f"{par['queued_ms']:>9.1f}ms {par['run_ms']:>7.1f}ms")
+
+    print()
+    for mode in ("sequential", "parallel"):
+        queued = [t["queued_ms"] for t in summary[mode]]
+        workers = 1 if mode == "sequential" else summary["workers"]
+        print(f"  {mode.capitalize()} ({workers} worker{'s' if workers > 1 else ''}): "
+              f"{summary[mode + '_s'] * 1000:.1f}ms wall clock, queueing delay "
+              f"median {statistics.median(queued):.1f}ms / max {max(queued):.1f}ms")
+    print(f"\n  Speedup: {summary['speedup']:.2f}x")
@@ -0,0 +1,130 @@
+"""
+Parquet shadow copies of the CSV and JSON files that queries read directly.
+
+Every query over a CSV or newline-delimited JSON file parses the whole text
+file again, while the same aggregation over Parquet reads only the needed
+columns (see the CSV vs Parquet comparison in 02_direct_file_queries.py).
+ParquetShadowCache.rewrite() points a query's CSV/JSON references at
+Parquet copies instead. The first query that reads a file converts it into
+data/cache/parquet/; later queries read the copy.
+
+A copy is named after the source path and the source's size and mtime, so
+when 01_generate_data.py rewrites a file the next query converts it again and
+the outdated copy is deleted. CSV files are converted with the schema
+recorded by csv_schemas.py, so the copy has the same column types as a direct
+read. Copies are evicted least-recently-used first once the directory
+exceeds `max_bytes`; a file larger than the whole budget is read directly.
+
+Reads with extra options, e.g. read_csv_auto('data/*.csv', filename=true),
+are left alone: the options (here the reported file name) refer to the text
+files.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+
+from csv_schemas import CsvSchemaRegistry
+from file_lru import FileLRU, temp_path
+from schema import quote
+
+SHADOW_DIR = os.path.join("data", "cache", "parquet")
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+TEXT_EXTENSIONS = {".csv": "csv", ".json": "json", ".ndjson": "json", ".jsonl": "json"}
+
+# 'x.csv' / 'x.json' table references after FROM or JOIN, and option-less
+# read_csv_auto('...') / read_json_auto('...') calls
+TEXT_FILE_TABLE = re.compile(r"\b(FROM|JOIN)\s+'([^']+\.(?:csv|json|ndjson|jsonl))'", re.IGNORECASE)
+TEXT_FILE_CALL = re.compile(r"\bread_(?:csv|json)(?:_auto)?\(\s*'([^']+)'\s*\)", re.IGNORECASE)
+
+def digest(value):
+    """Short stable hash of a JSON-serializable value, for file names."""
+    return hashlib.sha256(json.dumps(value).encode()).hexdigest()[:16]
+
+class ParquetShadowCache(FileLRU):
+    """Convert CSV/JSON files to Parquet once per version and rewrite queries to read the copies."""
+
+    def __init__(self, directory=SHADOW_DIR, max_bytes=DEFAULT_MAX_BYTES, csv_schemas=None):
+        super().__init__(directory, ".parquet", max_bytes)
+        self.csv_schemas = csv_schemas or CsvSchemaRegistry()
+        self.hits = 0
+        self.conversions = 0
+        self._too_large = set()  # Copies that exceeded max_bytes, not converted again
+        self._lock = threading.Lock()
+
+    def _source_sql(self, conn, path):
+        """Table expression reading a text file, for converting it."""
+        if TEXT_EXTENSIONS[os.path.splitext(path)[1].lower()] == "csv":
+            return self.csv_schemas.read_sql(conn, path)
+        return f"read_json_auto({quote(path)})"
+
+    def shadow(self, conn, path):
+        """Path of the Parquet copy of a CSV/JSON file, converting it with `conn` if needed.
+
+        Returns None when the copy doesn't fit in the cache.
+        """
+        stat = os.stat(path)
+        prefix = os.path.join(self.directory, digest(os.path.abspath(path)))
+        shadow_path = f"{prefix}-{digest([stat.st_size, stat.st_mtime_ns])}.parquet"
+        if shadow_path in self._too_large:
+            return None
+        try:
+            os.utime(shadow_path)  # Mark as recently used
+            with self._lock:
+                self.hits += 1
+            return shadow_path
+        except FileNotFoundError:
+            pass
+
+        tmp_path = temp_path(shadow_path)
+        conn.execute(f"COPY (SELECT * FROM {self._source_sql(conn, path)}) "
+                     f"TO {quote(tmp_path)} (FORMAT parquet, COMPRESSION zstd)")
+        os.replace(tmp_path, shadow_path)
+        with self._lock:
+            self.conversions += 1
+        # Copies of older versions of the file can never be read again
+        for stale in glob.glob(f"{prefix}-*.parquet"):
+            if stale != shadow_path:
+                os.remove(stale)
+        if os.path.getsize(shadow_path) > self.max_bytes:
+            os.remove(shadow_path)
+            self._too_large.add(shadow_path)
+            return None
+        self.evict(keep=shadow_path)
+        return shadow_path
+
+    def read_sql(self, conn, pattern):
+        """read_parquet() over the copies of the files matching `pattern`, or None.
+
+        None means some file has no copy, and the source has to be read as is.
+        """
+        files = sorted(glob.glob(pattern))
+        if not files or any(os.path.splitext(path)[1].lower() not in TEXT_EXTENSIONS
+                            for path in files):
+            return None
+        shadows = [self.shadow(conn, path) for path in files]
+        if None in shadows:
+            return None
+        if len(shadows) == 1:
+            return f"read_parquet({quote(shadows[0])})"
+        # Files matched by one glob may differ in columns, e.g. 'data/*.csv'
+        return f"read_parquet([{', '.join(map(quote, shadows))}], union_by_name=true)"
+
+    def rewrite(self, conn, sql):
+        """`sql` with its CSV/JSON file reads replaced by reads of their Parquet copies."""
+        def table(match):
+            read = self.read_sql(conn, match.group(2))
+            return match.group(0) if read is None else f"{match.group(1)} {read}"
+
+        def call(match):
+            return self.read_sql(conn, match.group(1)) or match.group(0)
+
+        return TEXT_FILE_TABLE.sub(table, TEXT_FILE_CALL.sub(call, sql))
+
+    def stats(self):
+        """Hit/conversion counters and the cache's current size on disk."""
+        return {"hits": self.hits, "conversions": self.conversions, **self.usage()}
@@ -0,0 +1,130 @@
+"""
+Operator-level profiles of queries, from DuckDB's JSON profiler.
+
+profile_query() runs a query with `enable_profiling = 'json'` and parses the
+operator tree DuckDB writes. Every operator records its own (exclusive) time,
+rows produced, rows scanned, bytes produced and extra info such as join
+conditions or Parquet filters. DuckDB reports memory only for the whole query
+(peak buffer memory and spilled bytes), so that is recorded per query.
+
+Profiles from a suite run can be combined:
+- hot_operators() totals time per operator type across all queries
+- folded_stacks() writes the "query;OP;OP;OP microseconds" format read by
+  flamegraph.pl, speedscope and inferno, with each operator's own time as
+  its self time
+"""
+
+import contextlib
+import json
+import os
+import tempfile
+from collections import defaultdict
+
+def operator_tree(node):
+    """Operator node of DuckDB's profile JSON, with the fields we report."""
+    return {
+        "name": node.get("operator_name") or node.get("operator_type"),
+        "seconds": node.get("operator_timing", 0.0),
+        "rows": node.get("operator_cardinality", 0),
+        "rows_scanned": node.get("operator_rows_scanned", 0),
+        "bytes": node.get("result_set_size", 0),
+        "extra_info": node.get("extra_info", {}),
+        "children": [operator_tree(child) for child in node.get("children", [])],
+    }
+
+@contextlib.contextmanager
+def json_profiling(conn):
+    """Profile the query run on `conn` inside the block.
+
+    Yields a dict that receives DuckDB's raw JSON profile when the block exits.
+    """
+    fd, path = tempfile.mkstemp(suffix=".json", prefix="duckdb-profile-")
+    os.close(fd)
+    raw = {}
+    try:
+        conn.execute("SET enable_profiling = 'json'")
+        conn.execute(f"SET profiling_output = '{path}'")
+        try:
+            yield raw
+        finally:
+            conn.execute("RESET enable_profiling")
+            conn.execute("RESET profiling_output")
+        with open(path) as f:
+            raw.update(json.load(f))
+    finally:
+        os.remove(path)
+
+def summarize(root, name):
+    """Query-level metrics and operator tree of a raw JSON profile."""
+    return {
+        "name": name,
+        "latency_seconds": root.get("latency", 0.0),
+        "cpu_seconds": root.get("cpu_time", 0.0),
+        "rows_returned": root.get("rows_returned", 0),
+        "rows_scanned": root.get("cumulative_rows_scanned", 0),
+        "bytes_read": root.get("total_bytes_read", 0),
+        "peak_buffer_memory": root.get("system_peak_buffer_memory", 0),
+        "peak_temp_dir_size": root.get("system_peak_temp_dir_size", 0),
+        "operators": [operator_tree(child) for child in root.get("children", [])],
+    }
+
+def profile_query(conn, sql, name=None):
+    """Run `sql` to completion on `conn` with JSON profiling; returns its profile."""
+    with json_profiling(conn) as root:
+        conn.execute(sql).fetchall()
+    return summarize(root, name or " ".join(sql.split())[:60])
+
+def walk(operators, stack=()):
+    """Yield (stack of operator names from the root, operator) for every operator."""
+    for op in operators:
+        path = stack + (op["name"],)
+        yield path, op
+        yield from walk(op["children"], path)
+
+def hot_operators(profiles):
+    """Total time, count and rows per operator name across profiles, slowest first."""
+    totals = defaultdict(lambda: {"seconds": 0.0, "count": 0, "rows": 0, "queries": set()})
+    for profile in profiles:
+        for _, op in walk(profile["operators"]):
+            entry = totals[op["name"]]
+            entry["seconds"] += op["seconds"]
+            entry["count"] += 1
+            entry["rows"] += op["rows"]
+            entry["queries"].add(profile["name"])
+    rows = [{"operator": name, **entry, "queries": len(entry["queries"])}
+            for name, entry in totals.items()]
+    return sorted(rows, key=lambda row: row["seconds"], reverse=True)
+
+def slowest_operator(profile):
+    """(stack, operator) with the highest own time in a profile."""
+    return max(walk(profile["operators"]), key=lambda item: item[1]["seconds"])
+
+def folded_stacks(profiles):
+    """Flame graph lines "query;OP;...;OP microseconds" of every operator's own time."""
+    lines = []
+    for profile in profiles:
+        for stack, op in walk(profile["operators"]):
+            micros = round(op["seconds"] * 1e6)
+            if micros:
+                frames = (profile["name"],) + stack
+                lines.append(";".join(frame.replace(";", ",").replace(" ", "_")
+                                      for frame in frames) + f" {micros}")
+    return lines
+
+def print_tree(profile):
+    """Print a profile's operator tree, like EXPLAIN ANALYZE but compact."""
+    total = sum(op["seconds"] for _, op in walk(profile["operators"])) or 1
+    print(f"  {profile['name']}: {profile['latency_seconds'] * 1000:.1f}ms, "
+          f"peak buffer memory {profile['peak_buffer_memory'] / 1024**2:.1f}MB")
+    for stack, op in walk(profile["operators"]):
+        indent = "  " * len(stack)
+        print(f"  {indent}{op['name']:<{36 - len(indent)}} {op['seconds'] * 1000:>8.2f}ms "
+              f"{op['seconds'] / total:>5.0%} {op['rows']:>10,} rows")
+
+def print_hot_operators(rows, limit=10):
+    """Print the operators that took the most time across a run."""
+    total = sum(row["seconds"] for row in rows) or 1
+    print(f"  {'operator':<24} {'time':>10} {'share':>6} {'count':>6} {'queries':>8} {'rows':>14}")
+    for row in rows[:limit]:
+        print(f"  {row['operator']:<24} {row['seconds'] * 1000:>8.1f}ms {row['seconds'] / total:>6.1%} "
+              f"{row['count']:>6} {row['queries']:>8} {row['rows']:>14,}")
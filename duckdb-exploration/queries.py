@@ -0,0 +1,865 @@
+"""
+Catalog of the named queries used across the demo scripts.
+
+Every query in 02/03/04 that reads the generated data is registered here under
+a stable name, so the demos, the benchmark suite (05_benchmark_suite.py) and
+any other tooling start from the same SQL.
+
+The SQL here is written as a user would write it, with auto-detected CSV/JSON
+reads, and 05 times it as is. 02 rewrites its CSV/JSON queries before running
+them: ParquetShadowCache.rewrite() (parquet_shadows.py) points the reads at
+cached Parquet copies, and CsvSchemaRegistry.rewrite() (csv_schemas.py) turns
+the remaining CSV reads into explicit ones with the recorded schema. Both
+return the same rows as the SQL here. 03 --rollups swaps some queries for
+their rollup variants (rollup_variant()).
+"""
+
+from dataclasses import dataclass
+
+from schema import create_types_sql, enum_select
+
+@dataclass(frozen=True)
+class RangeFilter:
+    """A `low <= column <= high` filter over some files; None leaves a side open.
+
+    Queries render their WHERE clause from it with sql(), and 02 reports from
+    the same filter how many row groups its min/max statistics rule out.
+    """
+    files: str
+    column: str
+    sql_type: str
+    low: object = None
+    high: object = None
+
+    def literal(self, value):
+        """SQL literal of a bound, e.g. DATE '2024-01-01' or 4242."""
+        return f"{self.sql_type} '{value}'" if isinstance(value, str) else str(value)
+
+    def sql(self):
+        """The filter as a SQL predicate."""
+        if self.low is not None and self.low == self.high:
+            return f"{self.column} = {self.literal(self.low)}"
+        if self.high is None:
+            return f"{self.column} >= {self.literal(self.low)}"
+        if self.low is None:
+            return f"{self.column} <= {self.literal(self.high)}"
+        return f"{self.column} BETWEEN {self.literal(self.low)} AND {self.literal(self.high)}"
+
+@dataclass(frozen=True)
+class Query:
+    """A named SQL query and where it is demonstrated."""
+    name: str
+    group: str  # "files" (02), "analytics" (03), "rollups" (03 --rollups) or "python" (04)
+    title: str
+    sql: str
+    needs_views: bool = False  # Reads the transactions/customers/products views
+    needs_rollups: bool = False  # Reads the `rollups` store attached by rollups.attach()
+    range_filter: RangeFilter = None  # Its selective filter, for the row-group pruning report
+
+QUERIES = {}
+
+# Views over the generated files. Transactions come from the year=/month=
+# layout; the partition keys are renamed so filters on them prune whole files
+# without clashing with `year`/`month` aliases in the queries below.
+#
+# The customers and products views cast their low-cardinality columns to the
+# ENUM types from schema.py, so joins that group by region, tier or category
+# hash 1-byte codes. The transactions view keeps payment_method and channel as
+# strings: casting 500K values on every scan costs more than the cheaper
+# GROUP BY saves.
+VIEW_FILES = {
+    "transactions": "data/transactions/*/*/*.parquet",
+    "customers": "data/customers.parquet",
+    "products": "data/products.parquet",
+}
+
+VIEWS_SQL = f"""
+    {create_types_sql()}
+
+    CREATE OR REPLACE VIEW transactions AS
+    SELECT * EXCLUDE (year, month), year AS sale_year, month AS sale_month
+    FROM read_parquet('{VIEW_FILES["transactions"]}', hive_partitioning = true);
+
+    CREATE OR REPLACE VIEW customers AS
+    SELECT {enum_select(["region", "state", "loyalty_tier"])} FROM '{VIEW_FILES["customers"]}';
+
+    CREATE OR REPLACE VIEW products AS
+    SELECT {enum_select(["category"])} FROM '{VIEW_FILES["products"]}';
+"""
+
+# Every generated data file, e.g. for evicting them from the page cache
+DATA_FILES = ["data/*.csv", "data/*.json", "data/*.parquet", "data/transactions/**/*.parquet"]
+
+def register(name, group, title, sql, needs_views=False, needs_rollups=False, range_filter=None):
+    """Add a query to the catalog."""
+    if name in QUERIES:
+        raise ValueError(f"Duplicate query name: {name}")
+    QUERIES[name] = Query(name, group, title, sql, needs_views, needs_rollups, range_filter)
+
+def setup_views(conn):
+    """Create the transactions/customers/products views on a connection (or the duckdb module)."""
+    conn.execute(VIEWS_SQL)
+
+def rollup_variant(name):
+    """Name of the rollup-backed variant of a query, or the name itself if there is none."""
+    variant = f"{name}_rollup"
+    return variant if variant in QUERIES else name
+
+def select(names=None, groups=None):
+    """Queries matching any of `names` and `groups` (all queries when both are empty)."""
+    if not names and not groups:
+        return list(QUERIES.values())
+    return [q for q in QUERIES.values()
+            if (names and q.name in names) or (groups and q.group in groups)]
+
+# Direct file queries (02_direct_file_queries.py)
+
+register("csv_customers_by_region_tier", "files", "Simple aggregation on CSV", """
+    SELECT
+        region,
+        loyalty_tier,
+        COUNT(*) as customer_count
+    FROM 'data/customers.csv'
+    GROUP BY region, loyalty_tier
+    ORDER BY region, customer_count DESC
+""")
+
+register("csv_revenue_by_region_tier", "files", "Join multiple CSV files (customers + transactions)", """
+    SELECT
+        c.region,
+        c.loyalty_tier,
+        COUNT(DISTINCT t.transaction_id) as num_transactions,
+        ROUND(SUM(t.total_amount), 2) as total_revenue,
+        ROUND(AVG(t.total_amount), 2) as avg_transaction
+    FROM 'data/transactions*.csv' t
+    JOIN 'data/customers.csv' c ON t.customer_id = c.customer_id
+    GROUP BY c.region, c.loyalty_tier
+    ORDER BY total_revenue DESC
+    LIMIT 10
+""")
+
+register("parquet_revenue_totals", "files", "DuckDB reads only needed columns from Parquet", """
+    SELECT
+        SUM(total_amount) as total_revenue,
+        AVG(total_amount) as avg_transaction,
+        COUNT(*) as num_transactions
+    FROM 'data/transactions*.parquet'
+""")
+
+since_2024 = RangeFilter("data/transactions*.parquet", "transaction_date", "DATE", "2024-01-01")
+register("parquet_monthly_revenue_2024", "files", "Predicate pushdown - DuckDB skips irrelevant row groups", f"""
+    SELECT
+        strftime(transaction_date, '%Y-%m') as month,
+        SUM(total_amount) as monthly_revenue
+    FROM '{since_2024.files}'
+    WHERE {since_2024.sql()}
+    GROUP BY month
+    ORDER BY month
+""", range_filter=since_2024)
+
+first_june_week = RangeFilter("data/transactions*.parquet", "transaction_date", "DATE",
+                              "2024-06-01", "2024-06-07")
+register("parquet_week_revenue", "files", "Narrow date range - selective when files are clustered by date", f"""
+    SELECT
+        transaction_date,
+        COUNT(*) as num_transactions,
+        ROUND(SUM(total_amount), 2) as revenue
+    FROM '{first_june_week.files}'
+    WHERE {first_june_week.sql()}
+    GROUP BY transaction_date
+    ORDER BY transaction_date
+""", range_filter=first_june_week)
+
+one_customer = RangeFilter("data/transactions*.parquet", "customer_id", "BIGINT", 4242, 4242)
+register("parquet_customer_history", "files", "Point lookup - selective when files are clustered by customer", f"""
+    SELECT
+        COUNT(*) as num_transactions,
+        MIN(transaction_date) as first_purchase,
+        MAX(transaction_date) as last_purchase,
+        ROUND(SUM(total_amount), 2) as total_spent
+    FROM '{one_customer.files}'
+    WHERE {one_customer.sql()}
+""", range_filter=one_customer)
+
+register("partitioned_monthly_revenue", "files", "Partition pruning - DuckDB skips whole year=/month= directories", """
+    SELECT
+        year,
+        month,
+        SUM(total_amount) as monthly_revenue
+    FROM read_parquet('data/transactions/*/*/*.parquet', hive_partitioning = true)
+    WHERE year = 2024
+      AND month <= 6
+    GROUP BY year, month
+    ORDER BY year, month
+""")
+
+register("parquet_category_region_profit", "files", "Complex 3-way join on Parquet files", """
+    SELECT
+        p.category,
+        c.region,
+        COUNT(*) as num_sales,
+        ROUND(SUM(t.total_amount), 2) as revenue,
+        ROUND(SUM(t.quantity * (t.unit_price - p.cost)), 2) as gross_profit
+    FROM 'data/transactions*.parquet' t
+    JOIN 'data/products.parquet' p ON t.product_id = p.product_id
+    JOIN 'data/customers.parquet' c ON t.customer_id = c.customer_id
+    WHERE p.is_active = true
+    GROUP BY p.category, c.region
+    ORDER BY revenue DESC
+    LIMIT 15
+""")
+
+register("json_revenue_by_payment_channel", "files", "Query newline-delimited JSON directly", """
+    SELECT
+        payment_method,
+        channel,
+        COUNT(*) as transactions,
+        ROUND(SUM(total_amount), 2) as revenue
+    FROM 'data/transactions_sample.json'
+    GROUP BY payment_method, channel
+    ORDER BY revenue DESC
+""")
+
+register("mixed_format_revenue_by_tier", "files", "Join CSV, Parquet, and JSON in a single query", """
+    SELECT
+        c.loyalty_tier,
+        COUNT(DISTINCT c.customer_id) as customers,
+        COUNT(t.transaction_id) as transactions,
+        ROUND(SUM(t.total_amount), 2) as revenue
+    FROM 'data/customers.csv' c
+    JOIN 'data/transactions*.parquet' t ON c.customer_id = t.customer_id
+    GROUP BY c.loyalty_tier
+    ORDER BY revenue DESC
+""")
+
+register("glob_parquet_row_counts", "files", "Query all Parquet files", """
+    SELECT
+        filename,
+        COUNT(*) as row_count
+    FROM read_parquet('data/*.parquet', filename=true)
+    GROUP BY filename
+""")
+
+register("glob_csv_row_counts", "files", "Query all CSV files with schema discovery", """
+    SELECT
+        filename,
+        COUNT(*) as row_count
+    FROM read_csv_auto('data/*.csv', filename=true)
+    GROUP BY filename
+""")
+
+register("parquet_schema", "files", "Parquet file metadata (schema + statistics)", """
+    SELECT * FROM parquet_schema('data/transactions*.parquet')
+""")
+
+register("parquet_row_groups", "files", "Parquet file statistics", """
+    SELECT
+        file_name,
+        row_group_id,
+        row_group_num_rows,
+        row_group_bytes
+    FROM parquet_metadata('data/transactions*.parquet')
+    LIMIT 5
+""")
+
+register("csv_revenue_by_payment", "files", "Aggregation benchmark on CSV", """
+    SELECT
+        payment_method,
+        COUNT(*) as cnt,
+        SUM(total_amount) as revenue
+    FROM 'data/transactions*.csv'
+    GROUP BY payment_method
+""")
+
+register("parquet_revenue_by_payment", "files", "Aggregation benchmark on Parquet", """
+    SELECT
+        payment_method,
+        COUNT(*) as cnt,
+        SUM(total_amount) as revenue
+    FROM 'data/transactions*.parquet'
+    GROUP BY payment_method
+""")
+
+
+# Analytics over the transactions/customers/products views (03_analytics_and_window_functions.py)
+
+register("running_totals", "analytics", "Running totals and moving averages", """
+    WITH daily_sales AS (
+        SELECT
+            transaction_date as sale_date,
+            SUM(total_amount) as daily_revenue
+        FROM transactions
+        WHERE sale_year = 2024
+          AND sale_month = 1
+        GROUP BY sale_date
+    )
+    SELECT
+        sale_date,
+        daily_revenue,
+        SUM(daily_revenue) OVER (ORDER BY sale_date) as running_total,
+        ROUND(AVG(daily_revenue) OVER (
+            ORDER BY sale_date
+            ROWS BETWEEN 6 PRECEDING AND CURRENT ROW
+        ), 2) as moving_avg_7day
+    FROM daily_sales
+    ORDER BY sale_date
+    LIMIT 15
+""", needs_views=True)
+
+register("customer_rankings", "analytics", "Ranking customers by spending", """
+    WITH customer_spending AS (
+        SELECT
+            c.customer_id,
+            c.first_name || ' ' || c.last_name as customer_name,
+            c.loyalty_tier,
+            c.region,
+            SUM(t.total_amount) as total_spent,
+            COUNT(*) as num_purchases
+        FROM transactions t
+        JOIN customers c ON t.customer_id = c.customer_id
+        GROUP BY c.customer_id, c.first_name, c.last_name, c.loyalty_tier, c.region
+    )
+    SELECT
+        customer_name,
+        loyalty_tier,
+        region,
+        total_spent,
+        num_purchases,
+        RANK() OVER (ORDER BY total_spent DESC) as overall_rank,
+        RANK() OVER (PARTITION BY region ORDER BY total_spent DESC) as region_rank
+    FROM customer_spending
+    QUALIFY region_rank <= 3
+    ORDER BY region, region_rank
+""", needs_views=True)
+
+register("yoy_revenue", "analytics", "Year-over-year comparison with LAG", """
+    WITH monthly_revenue AS (
+        SELECT
+            strftime(transaction_date, '%Y-%m') as month,
+            year(transaction_date) as year,
+            month(transaction_date) as month_num,
+            SUM(total_amount) as revenue
+        FROM transactions
+        GROUP BY month, year, month_num
+    )
+    SELECT
+        month,
+        revenue,
+        LAG(revenue, 12) OVER (ORDER BY month) as prev_year_revenue,
+        ROUND(
+            (revenue - LAG(revenue, 12) OVER (ORDER BY month))
+            / LAG(revenue, 12) OVER (ORDER BY month) * 100,
+            2
+        ) as yoy_growth_pct
+    FROM monthly_revenue
+    WHERE year = 2024
+    ORDER BY month
+""", needs_views=True)
+
+register("ltv_quartiles", "analytics", "NTILE - Customer segmentation into quartiles", """
+    WITH customer_value AS (
+        SELECT
+            c.customer_id,
+            c.loyalty_tier,
+            SUM(t.total_amount) as lifetime_value
+        FROM transactions t
+        JOIN customers c ON t.customer_id = c.customer_id
+        GROUP BY c.customer_id, c.loyalty_tier
+    ),
+    with_quartiles AS (
+        SELECT
+            customer_id,
+            lifetime_value,
+            NTILE(4) OVER (ORDER BY lifetime_value DESC) as quartile
+        FROM customer_value
+    )
+    SELECT
+        quartile,
+        COUNT(*) as customer_count,
+        ROUND(MIN(lifetime_value), 2) as min_ltv,
+        ROUND(MAX(lifetime_value), 2) as max_ltv,
+        ROUND(AVG(lifetime_value), 2) as avg_ltv
+    FROM with_quartiles
+    GROUP BY quartile
+    ORDER BY quartile
+""", needs_views=True)
+
+register("grouping_sets_category_region", "analytics", "GROUPING SETS - Multiple aggregation levels in one query", """
+    SELECT
+        COALESCE(p.category, 'ALL CATEGORIES') as category,
+        COALESCE(c.region, 'ALL REGIONS') as region,
+        COUNT(*) as num_sales,
+        ROUND(SUM(t.total_amount), 2) as revenue
+    FROM transactions t
+    JOIN products p ON t.product_id = p.product_id
+    JOIN customers c ON t.customer_id = c.customer_id
+    GROUP BY GROUPING SETS (
+        (p.category, c.region),
+        (p.category),
+        (c.region),
+        ()
+    )
+    ORDER BY category, region
+    LIMIT 20
+""", needs_views=True)
+
+register("cube_tier_channel", "analytics", "CUBE - All dimension combinations", """
+    SELECT
+        COALESCE(c.loyalty_tier, 'ALL') as loyalty_tier,
+        COALESCE(t.channel, 'ALL') as channel,
+        COUNT(*) as transactions,
+        ROUND(AVG(t.total_amount), 2) as avg_order_value
+    FROM transactions t
+    JOIN customers c ON t.customer_id = c.customer_id
+    GROUP BY CUBE (c.loyalty_tier, t.channel)
+    ORDER BY loyalty_tier, channel
+""", needs_views=True)
+
+register("rollup_category_subcategory", "analytics", "ROLLUP - Hierarchical totals", """
+    SELECT
+        COALESCE(p.category, 'TOTAL') as category,
+        COALESCE(p.subcategory, 'Subtotal') as subcategory,
+        COUNT(*) as num_sales,
+        ROUND(SUM(t.total_amount), 2) as revenue
+    FROM transactions t
+    JOIN products p ON t.product_id = p.product_id
+    WHERE p.category IN ('Electronics', 'Clothing')
+    GROUP BY ROLLUP (p.category, p.subcategory)
+    ORDER BY category NULLS LAST, subcategory NULLS LAST
+""", needs_views=True)
+
+register("amount_percentiles_by_channel", "analytics", "Percentiles and distribution analysis", """
+    SELECT
+        channel,
+        COUNT(*) as n,
+        ROUND(AVG(total_amount), 2) as mean,
+        ROUND(STDDEV(total_amount), 2) as std_dev,
+        ROUND(PERCENTILE_CONT(0.25) WITHIN GROUP (ORDER BY total_amount), 2) as p25,
+        ROUND(PERCENTILE_CONT(0.50) WITHIN GROUP (ORDER BY total_amount), 2) as median,
+        ROUND(PERCENTILE_CONT(0.75) WITHIN GROUP (ORDER BY total_amount), 2) as p75,
+        ROUND(PERCENTILE_CONT(0.95) WITHIN GROUP (ORDER BY total_amount), 2) as p95
+    FROM transactions
+    GROUP BY channel
+""", needs_views=True)
+
+register("discount_correlation_by_category", "analytics", "Correlation analysis", """
+    SELECT
+        p.category,
+        ROUND(CORR(t.discount_percent, t.quantity), 3) as discount_qty_corr,
+        ROUND(CORR(t.unit_price, t.quantity), 3) as price_qty_corr,
+        COUNT(*) as sample_size
+    FROM transactions t
+    JOIN products p ON t.product_id = p.product_id
+    GROUP BY p.category
+    ORDER BY discount_qty_corr DESC
+""", needs_views=True)
+
+register("amount_histogram", "analytics", "Histogram / Distribution buckets", """
+    WITH buckets AS (
+        SELECT
+            CASE
+                WHEN total_amount < 100 THEN '0-100'
+                WHEN total_amount < 250 THEN '100-250'
+                WHEN total_amount < 500 THEN '250-500'
+                WHEN total_amount < 1000 THEN '500-1000'
+                ELSE '1000+'
+            END as amount_bucket,
+            CASE
+                WHEN total_amount < 100 THEN 1
+                WHEN total_amount < 250 THEN 2
+                WHEN total_amount < 500 THEN 3
+                WHEN total_amount < 1000 THEN 4
+                ELSE 5
+            END as bucket_order,
+            total_amount
+        FROM transactions
+    )
+    SELECT
+        amount_bucket,
+        COUNT(*) as count,
+        ROUND(COUNT(*) * 100.0 / SUM(COUNT(*)) OVER (), 2) as percentage
+    FROM buckets
+    GROUP BY amount_bucket, bucket_order
+    ORDER BY bucket_order
+""", needs_views=True)
+
+register("day_of_week_pattern", "analytics", "Seasonality analysis - Day of week patterns", """
+    SELECT
+        DAYNAME(transaction_date) as day_of_week,
+        EXTRACT(ISODOW FROM transaction_date) as day_num,
+        COUNT(*) as num_transactions,
+        ROUND(AVG(total_amount), 2) as avg_order_value,
+        ROUND(SUM(total_amount), 2) as total_revenue
+    FROM transactions
+    GROUP BY day_of_week, day_num
+    ORDER BY day_num
+""", needs_views=True)
+
+register("hour_of_day_pattern", "analytics", "Hour-of-day analysis", """
+    SELECT
+        hour(transaction_time) as hour,
+        COUNT(*) as num_transactions,
+        ROUND(AVG(total_amount), 2) as avg_order_value
+    FROM transactions
+    GROUP BY hour
+    ORDER BY hour
+""", needs_views=True)
+
+register("mom_growth", "analytics", "Month-over-month growth rates", """
+    WITH monthly AS (
+        SELECT
+            strftime(transaction_date, '%Y-%m') as month,
+            SUM(total_amount) as revenue
+        FROM transactions
+        GROUP BY month
+    )
+    SELECT
+        month,
+        ROUND(revenue, 2) as revenue,
+        ROUND(
+            (revenue - LAG(revenue) OVER (ORDER BY month))
+            / LAG(revenue) OVER (ORDER BY month) * 100,
+            2
+        ) as mom_growth_pct
+    FROM monthly
+    ORDER BY month
+""", needs_views=True)
+
+register("cohort_retention", "analytics", "Customer cohort by signup month with retention", """
+    WITH customer_cohorts AS (
+        SELECT
+            c.customer_id,
+            strftime(c.signup_date, '%Y-%m') as cohort_month,
+            strftime(t.transaction_date, '%Y-%m') as purchase_month
+        FROM customers c
+        JOIN transactions t ON c.customer_id = t.customer_id
+    ),
+    cohort_sizes AS (
+        SELECT
+            cohort_month,
+            COUNT(DISTINCT customer_id) as cohort_size
+        FROM customer_cohorts
+        GROUP BY cohort_month
+    ),
+    monthly_activity AS (
+        SELECT
+            cohort_month,
+            purchase_month,
+            COUNT(DISTINCT customer_id) as active_customers
+        FROM customer_cohorts
+        GROUP BY cohort_month, purchase_month
+    )
+    SELECT
+        m.cohort_month,
+        s.cohort_size,
+        m.purchase_month,
+        m.active_customers,
+        ROUND(m.active_customers * 100.0 / s.cohort_size, 1) as retention_pct
+    FROM monthly_activity m
+    JOIN cohort_sizes s ON m.cohort_month = s.cohort_month
+    WHERE m.cohort_month IN ('2021-01', '2021-06', '2022-01')
+      AND m.purchase_month >= '2024-01'
+      AND m.purchase_month <= '2024-06'
+    ORDER BY m.cohort_month, m.purchase_month
+""", needs_views=True)
+
+register("purchase_frequency", "analytics", "Customer purchase frequency distribution", """
+    WITH customer_purchases AS (
+        SELECT
+            customer_id,
+            COUNT(*) as num_purchases
+        FROM transactions
+        GROUP BY customer_id
+    ),
+    frequency_segments AS (
+        SELECT
+            CASE
+                WHEN num_purchases = 1 THEN '1 purchase'
+                WHEN num_purchases BETWEEN 2 AND 5 THEN '2-5 purchases'
+                WHEN num_purchases BETWEEN 6 AND 20 THEN '6-20 purchases'
+                WHEN num_purchases BETWEEN 21 AND 50 THEN '21-50 purchases'
+                ELSE '50+ purchases'
+            END as frequency_segment,
+            CASE
+                WHEN num_purchases = 1 THEN 1
+                WHEN num_purchases BETWEEN 2 AND 5 THEN 2
+                WHEN num_purchases BETWEEN 6 AND 20 THEN 3
+                WHEN num_purchases BETWEEN 21 AND 50 THEN 4
+                ELSE 5
+            END as segment_order,
+            num_purchases
+        FROM customer_purchases
+    )
+    SELECT
+        frequency_segment,
+        COUNT(*) as customers,
+        ROUND(COUNT(*) * 100.0 / SUM(COUNT(*)) OVER (), 1) as pct_of_customers
+    FROM frequency_segments
+    GROUP BY frequency_segment, segment_order
+    ORDER BY segment_order
+""", needs_views=True)
+
+register("rfm_segments", "analytics", "RFM (Recency, Frequency, Monetary) Analysis", """
+    WITH customer_metrics AS (
+        SELECT
+            customer_id,
+            MAX(transaction_date) as last_purchase,
+            COUNT(*) as frequency,
+            SUM(total_amount) as monetary
+        FROM transactions
+        GROUP BY customer_id
+    ),
+    rfm_scores AS (
+        SELECT
+            customer_id,
+            NTILE(5) OVER (ORDER BY last_purchase DESC) as recency_score,
+            NTILE(5) OVER (ORDER BY frequency) as frequency_score,
+            NTILE(5) OVER (ORDER BY monetary) as monetary_score
+        FROM customer_metrics
+    )
+    SELECT
+        CASE
+            WHEN recency_score >= 4 AND frequency_score >= 4 AND monetary_score >= 4 THEN 'Champions'
+            WHEN recency_score >= 4 AND frequency_score >= 3 THEN 'Loyal Customers'
+            WHEN recency_score >= 3 AND monetary_score >= 4 THEN 'Big Spenders'
+            WHEN recency_score >= 4 AND frequency_score <= 2 THEN 'New Customers'
+            WHEN recency_score <= 2 AND frequency_score >= 3 THEN 'At Risk'
+            WHEN recency_score <= 2 AND frequency_score <= 2 THEN 'Lost'
+            ELSE 'Need Attention'
+        END as segment,
+        COUNT(*) as customer_count,
+        ROUND(AVG(recency_score), 1) as avg_recency,
+        ROUND(AVG(frequency_score), 1) as avg_frequency,
+        ROUND(AVG(monetary_score), 1) as avg_monetary
+    FROM rfm_scores
+    GROUP BY segment
+    ORDER BY customer_count DESC
+""", needs_views=True)
+
+# The same analytics answered from the materialized rollups in rollups.py
+# (03_analytics_and_window_functions.py --rollups). Each is named after the
+# query it replaces and returns the same rows.
+
+register("running_totals_rollup", "rollups", "Running totals and moving averages", """
+    SELECT
+        sale_date,
+        revenue as daily_revenue,
+        SUM(revenue) OVER (ORDER BY sale_date) as running_total,
+        ROUND(AVG(revenue) OVER (
+            ORDER BY sale_date
+            ROWS BETWEEN 6 PRECEDING AND CURRENT ROW
+        ), 2) as moving_avg_7day
+    FROM rollups.daily_revenue
+    WHERE sale_date >= DATE '2024-01-01'
+      AND sale_date < DATE '2024-02-01'
+    ORDER BY sale_date
+    LIMIT 15
+""", needs_rollups=True)
+
+register("customer_rankings_rollup", "rollups", "Ranking customers by spending", """
+    WITH customer_spending AS (
+        SELECT
+            c.customer_id,
+            c.first_name || ' ' || c.last_name as customer_name,
+            c.loyalty_tier,
+            c.region,
+            r.revenue as total_spent,
+            r.num_purchases
+        FROM rollups.customer_totals r
+        JOIN customers c ON r.customer_id = c.customer_id
+    )
+    SELECT
+        customer_name,
+        loyalty_tier,
+        region,
+        total_spent,
+        num_purchases,
+        RANK() OVER (ORDER BY total_spent DESC) as overall_rank,
+        RANK() OVER (PARTITION BY region ORDER BY total_spent DESC) as region_rank
+    FROM customer_spending
+    QUALIFY region_rank <= 3
+    ORDER BY region, region_rank
+""", needs_views=True, needs_rollups=True)
+
+register("yoy_revenue_rollup", "rollups", "Year-over-year comparison with LAG", """
+    SELECT
+        month,
+        revenue,
+        LAG(revenue, 12) OVER (ORDER BY month) as prev_year_revenue,
+        ROUND(
+            (revenue - LAG(revenue, 12) OVER (ORDER BY month))
+            / LAG(revenue, 12) OVER (ORDER BY month) * 100,
+            2
+        ) as yoy_growth_pct
+    FROM rollups.monthly_revenue
+    WHERE month LIKE '2024-%'
+    ORDER BY month
+""", needs_rollups=True)
+
+register("ltv_quartiles_rollup", "rollups", "NTILE - Customer segmentation into quartiles", """
+    WITH with_quartiles AS (
+        SELECT
+            customer_id,
+            revenue as lifetime_value,
+            NTILE(4) OVER (ORDER BY revenue DESC) as quartile
+        FROM rollups.customer_totals
+    )
+    SELECT
+        quartile,
+        COUNT(*) as customer_count,
+        ROUND(MIN(lifetime_value), 2) as min_ltv,
+        ROUND(MAX(lifetime_value), 2) as max_ltv,
+        ROUND(AVG(lifetime_value), 2) as avg_ltv
+    FROM with_quartiles
+    GROUP BY quartile
+    ORDER BY quartile
+""", needs_rollups=True)
+
+register("grouping_sets_category_region_rollup", "rollups", "GROUPING SETS - Multiple aggregation levels in one query", """
+    SELECT
+        COALESCE(category, 'ALL CATEGORIES') as category,
+        COALESCE(region, 'ALL REGIONS') as region,
+        SUM(num_sales)::BIGINT as num_sales,
+        ROUND(SUM(revenue), 2) as revenue
+    FROM rollups.category_region_sales
+    GROUP BY GROUPING SETS (
+        (category, region),
+        (category),
+        (region),
+        ()
+    )
+    ORDER BY category, region
+    LIMIT 20
+""", needs_rollups=True)
+
+register("mom_growth_rollup", "rollups", "Month-over-month growth rates", """
+    SELECT
+        month,
+        ROUND(revenue, 2) as revenue,
+        ROUND(
+            (revenue - LAG(revenue) OVER (ORDER BY month))
+            / LAG(revenue) OVER (ORDER BY month) * 100,
+            2
+        ) as mom_growth_pct
+    FROM rollups.monthly_revenue
+    ORDER BY month
+""", needs_rollups=True)
+
+register("purchase_frequency_rollup", "rollups", "Customer purchase frequency distribution", """
+    WITH frequency_segments AS (
+        SELECT
+            CASE
+                WHEN num_purchases = 1 THEN '1 purchase'
+                WHEN num_purchases BETWEEN 2 AND 5 THEN '2-5 purchases'
+                WHEN num_purchases BETWEEN 6 AND 20 THEN '6-20 purchases'
+                WHEN num_purchases BETWEEN 21 AND 50 THEN '21-50 purchases'
+                ELSE '50+ purchases'
+            END as frequency_segment,
+            CASE
+                WHEN num_purchases = 1 THEN 1
+                WHEN num_purchases BETWEEN 2 AND 5 THEN 2
+                WHEN num_purchases BETWEEN 6 AND 20 THEN 3
+                WHEN num_purchases BETWEEN 21 AND 50 THEN 4
+                ELSE 5
+            END as segment_order,
+            num_purchases
+        FROM rollups.customer_totals
+    )
+    SELECT
+        frequency_segment,
+        COUNT(*) as customers,
+        ROUND(COUNT(*) * 100.0 / SUM(COUNT(*)) OVER (), 1) as pct_of_customers
+    FROM frequency_segments
+    GROUP BY frequency_segment, segment_order
+    ORDER BY segment_order
+""", needs_rollups=True)
+
+register("rfm_segments_rollup", "rollups", "RFM (Recency, Frequency, Monetary) Analysis", """
+    WITH rfm_scores AS (
+        SELECT
+            customer_id,
+            NTILE(5) OVER (ORDER BY last_purchase DESC) as recency_score,
+            NTILE(5) OVER (ORDER BY num_purchases) as frequency_score,
+            NTILE(5) OVER (ORDER BY revenue) as monetary_score
+        FROM rollups.customer_totals
+    )
+    SELECT
+        CASE
+            WHEN recency_score >= 4 AND frequency_score >= 4 AND monetary_score >= 4 THEN 'Champions'
+            WHEN recency_score >= 4 AND frequency_score >= 3 THEN 'Loyal Customers'
+            WHEN recency_score >= 3 AND monetary_score >= 4 THEN 'Big Spenders'
+            WHEN recency_score >= 4 AND frequency_score <= 2 THEN 'New Customers'
+            WHEN recency_score <= 2 AND frequency_score >= 3 THEN 'At Risk'
+            WHEN recency_score <= 2 AND frequency_score <= 2 THEN 'Lost'
+            ELSE 'Need Attention'
+        END as segment,
+        COUNT(*) as customer_count,
+        ROUND(AVG(recency_score), 1) as avg_recency,
+        ROUND(AVG(frequency_score), 1) as avg_frequency,
+        ROUND(AVG(monetary_score), 1) as avg_monetary
+    FROM rfm_scores
+    GROUP BY segment
+    ORDER BY customer_count DESC
+""", needs_rollups=True)
+
+
+# Python integration (04_python_integration.py)
+
+register("top_customers", "python", "Top 10 customers by total spend", """
+    SELECT
+        c.customer_id,
+        c.first_name || ' ' || c.last_name as name,
+        c.loyalty_tier,
+        SUM(t.total_amount) as total_spent
+    FROM 'data/transactions*.parquet' t
+    JOIN 'data/customers.parquet' c ON t.customer_id = c.customer_id
+    GROUP BY c.customer_id, c.first_name, c.last_name, c.loyalty_tier
+    ORDER BY total_spent DESC
+    LIMIT 10
+""")
+
+register("high_discount_revenue", "python", "Revenue from high-discount sales by region and category", """
+    SELECT
+        c.region,
+        p.category,
+        COUNT(*) as transactions,
+        ROUND(SUM(t.total_amount), 2) as revenue
+    FROM transactions t
+    JOIN customers c ON t.customer_id = c.customer_id
+    JOIN products p ON t.product_id = p.product_id
+    WHERE t.discount_percent >= 20
+    GROUP BY c.region, p.category
+    ORDER BY revenue DESC
+    LIMIT 10
+""", needs_views=True)
+
+register("revenue_by_channel", "python", "Revenue by channel", """
+    SELECT
+        channel,
+        COUNT(*) as count,
+        SUM(total_amount) as revenue
+    FROM 'data/transactions*.parquet'
+    GROUP BY channel
+""")
+
+register("order_size_buckets", "python", "Order size buckets with native SQL CASE", """
+    SELECT
+        CASE
+            WHEN total_amount < 100 THEN 'small'
+            WHEN total_amount < 500 THEN 'medium'
+            ELSE 'large'
+        END as size_category,
+        COUNT(*) as count,
+        ROUND(AVG(total_amount), 2) as avg_amount
+    FROM 'data/transactions*.parquet'
+    GROUP BY size_category
+    ORDER BY avg_amount
+""")
+
+register("monthly_revenue", "python", "Monthly revenue (persisted table)", """
+    SELECT
+        strftime(transaction_date, '%Y-%m') as month,
+        SUM(total_amount) as revenue
+    FROM 'data/transactions*.parquet'
+    GROUP BY month
+""")
@@ -0,0 +1,145 @@
+"""
+On-disk cache of query results, keyed on the SQL and the files it reads.
+
+The key of a result is a hash of the normalized SQL, the DuckDB version, and
+the path, size and mtime of every file the query reads: the 'data/...' file
+and glob literals in the SQL, plus the files behind the transactions/
+customers/products views and the rollup store's source files when it refers
+to those. When 01_generate_data.py rewrites or adds a file, the key changes
+and the query runs again. Stale results are never served; they age out of the cache.
+
+Results are stored as Arrow IPC files in data/cache/. Entries are evicted in
+least-recently-used order (a hit touches the file's mtime) once the cache
+exceeds `max_bytes` or `max_entries`.
+
+File contents aren't hashed: that would read every source file on each lookup,
+which costs more than many of the queries being cached.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import duckdb
+import pyarrow as pa
+
+import rollups
+from file_lru import FileLRU, temp_path
+from queries import VIEW_FILES
+
+CACHE_DIR = os.path.join("data", "cache")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+FILE_LITERAL = re.compile(r"'(data/[^']*)'")
+STRING_LITERAL = re.compile(r"'[^']*'")
+
+def normalize_sql(sql):
+    """Collapse whitespace and drop a trailing semicolon, so formatting doesn't change the key."""
+    return " ".join(sql.split()).rstrip(";").strip()
+
+def source_patterns(sql):
+    """File paths and globs a query reads, found in its SQL."""
+    patterns = set(FILE_LITERAL.findall(sql))
+    identifiers = STRING_LITERAL.sub("''", sql)
+    for view, pattern in VIEW_FILES.items():
+        if re.search(rf"\b{view}\b", identifiers):
+            patterns.add(pattern)
+    # refresh() writes to the rollup store on every run, so its own mtime always
+    # changes; the rollups only change when the files they are computed from do
+    if re.search(r"\brollups\.", identifiers):
+        patterns.update(rollups.SOURCE_FILES)
+    return sorted(patterns)
+
+def fingerprint(patterns):
+    """[path, size, mtime_ns] of every file matching `patterns`, in a stable order."""
+    paths = sorted({path for pattern in patterns for path in glob.glob(pattern, recursive=True)})
+    return [[path, stat.st_size, stat.st_mtime_ns] for path, stat in
+            ((path, os.stat(path)) for path in paths)]
+
+class ResultCache(FileLRU):
+    """LRU cache of query results as Arrow IPC files."""
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, max_entries=None,
+                 metrics=None):
+        super().__init__(directory, ".arrow", max_bytes, max_entries)
+        self.metrics = metrics  # Optional metrics.QueryMetrics for hits, misses and executions
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def key(self, sql):
+        """Cache key of a query, or None if it reads no files (e.g. a DataFrame)."""
+        patterns = source_patterns(sql)
+        if not patterns:
+            return None
+        payload = json.dumps([normalize_sql(sql), duckdb.__version__, fingerprint(patterns)])
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.arrow")
+
+    def _load(self, key):
+        path = self._path(key)
+        try:
+            with pa.memory_map(path) as source:
+                table = pa.ipc.open_file(source).read_all()
+            os.utime(path)  # Mark as recently used
+        except FileNotFoundError:
+            return None
+        return table
+
+    def _store(self, key, table):
+        path = self._path(key)
+        tmp_path = temp_path(path)
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+        self.evict(keep=path)
+
+    def get(self, sql):
+        """Cached result of `sql` as a pyarrow Table, or None."""
+        key = self.key(sql)
+        return None if key is None else self._load(key)
+
+    def put(self, sql, table):
+        """Store a result, then evict old entries beyond the size limits."""
+        key = self.key(sql)
+        if key is not None:
+            self._store(key, table)
+
+    def fetch(self, conn, sql, name="query"):
+        """Result of `sql` from the cache, or run on `conn` and cached; returns (table, hit).
+
+        Queries that read no files are always run and never cached. `name`
+        labels the query in the metrics.
+        """
+        start = time.perf_counter()
+        key = self.key(sql)
+        table = None if key is None else self._load(key)
+        hit = table is not None
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if self.metrics is not None:
+            self.metrics.record_cache(name, hit, time.perf_counter() - start,
+                                      table.num_rows if hit else 0)
+        if hit:
+            return table, True
+        if self.metrics is not None:
+            table = self.metrics.execute(conn, sql, name)
+        else:
+            table = conn.execute(sql).to_arrow_table()
+        if key is not None:
+            self._store(key, table)
+        return table, False
+
+    def stats(self):
+        """Hit/miss counters and the cache's current size on disk."""
+        return {"hits": self.hits, "misses": self.misses, **self.usage()}
@@ -0,0 +1,163 @@
+"""
+Materialized rollups of the transactions data, kept in data/rollups.duckdb.
+
+Most analytics queries rescan every transaction only to rebuild the same daily
+revenue, per-customer totals and category/region aggregates. The rollup store
+keeps those aggregates in a DuckDB file, so monthly revenue, MoM/YoY growth
+and customer lifetime value are answered from a few thousand rows instead.
+
+refresh() keeps the store current. Parquet files it has not loaded yet (e.g.
+from `01_generate_data.py --append-days`) are aggregated and merged into the
+existing rows; every rollup is a count, sum, min or max, so older files never
+need to be rescanned.
+If a file it already loaded has changed or disappeared, or the customers or
+products tables changed, the rollups are rebuilt from scratch.
+"""
+
+import glob
+import os
+import time
+
+import connections
+
+ROLLUP_DB = os.path.join("data", "rollups.duckdb")
+TRANSACTION_FILES = os.path.join("data", "transactions", "*", "*", "*.parquet")
+CUSTOMERS_FILE = os.path.join("data", "customers.parquet")
+PRODUCTS_FILE = os.path.join("data", "products.parquet")
+# Everything the rollups are computed from
+SOURCE_FILES = [TRANSACTION_FILES, CUSTOMERS_FILE, PRODUCTS_FILE]
+
+SCHEMA_SQL = """
+    -- Source files already merged into the rollups, to detect new and changed files
+    CREATE TABLE IF NOT EXISTS loaded_files (
+        path VARCHAR PRIMARY KEY,
+        size BIGINT,
+        mtime DOUBLE
+    );
+
+    CREATE TABLE IF NOT EXISTS daily_revenue (
+        sale_date DATE PRIMARY KEY,
+        num_sales BIGINT,
+        revenue DOUBLE
+    );
+
+    CREATE TABLE IF NOT EXISTS customer_totals (
+        customer_id BIGINT PRIMARY KEY,
+        num_purchases BIGINT,
+        revenue DOUBLE,
+        first_purchase DATE,
+        last_purchase DATE
+    );
+
+    CREATE TABLE IF NOT EXISTS category_region_sales (
+        category VARCHAR,
+        region VARCHAR,
+        num_sales BIGINT,
+        revenue DOUBLE,
+        PRIMARY KEY (category, region)
+    );
+
+    CREATE OR REPLACE VIEW monthly_revenue AS
+    SELECT
+        strftime(sale_date, '%Y-%m') as month,
+        SUM(num_sales)::BIGINT as num_sales,
+        SUM(revenue) as revenue
+    FROM daily_revenue
+    GROUP BY month;
+"""
+
+ROLLUP_TABLES = ["daily_revenue", "customer_totals", "category_region_sales"]
+
+# Aggregates the `new_transactions` table and adds it to the existing rollups
+MERGE_SQL = f"""
+    INSERT INTO daily_revenue
+    SELECT transaction_date, COUNT(*), SUM(total_amount)
+    FROM new_transactions
+    GROUP BY ALL
+    ON CONFLICT (sale_date) DO UPDATE SET
+        num_sales = num_sales + EXCLUDED.num_sales,
+        revenue = revenue + EXCLUDED.revenue;
+
+    INSERT INTO customer_totals
+    SELECT
+        customer_id,
+        COUNT(*),
+        SUM(total_amount),
+        MIN(transaction_date),
+        MAX(transaction_date)
+    FROM new_transactions
+    GROUP BY ALL
+    ON CONFLICT (customer_id) DO UPDATE SET
+        num_purchases = num_purchases + EXCLUDED.num_purchases,
+        revenue = revenue + EXCLUDED.revenue,
+        first_purchase = LEAST(first_purchase, EXCLUDED.first_purchase),
+        last_purchase = GREATEST(last_purchase, EXCLUDED.last_purchase);
+
+    INSERT INTO category_region_sales
+    SELECT p.category, c.region, COUNT(*), SUM(t.total_amount)
+    FROM new_transactions t
+    JOIN '{PRODUCTS_FILE}' p ON t.product_id = p.product_id
+    JOIN '{CUSTOMERS_FILE}' c ON t.customer_id = c.customer_id
+    GROUP BY ALL
+    ON CONFLICT (category, region) DO UPDATE SET
+        num_sales = num_sales + EXCLUDED.num_sales,
+        revenue = revenue + EXCLUDED.revenue;
+"""
+
+def file_states(paths):
+    """(size, mtime) of each path, used to notice files that changed."""
+    return {path: (os.path.getsize(path), os.path.getmtime(path)) for path in paths}
+
+def refresh(db_path=ROLLUP_DB, rebuild=False):
+    """Bring the rollups up to date with the data files.
+
+    Returns a summary dict: whether the store was rebuilt, and how many files
+    and rows were merged in.
+    """
+    start = time.perf_counter()
+    current = file_states(sorted(glob.glob(TRANSACTION_FILES)) + [CUSTOMERS_FILE, PRODUCTS_FILE])
+
+    conn = connections.connect(db_path)
+    try:
+        conn.execute(SCHEMA_SQL)
+        loaded = {path: (size, mtime) for path, size, mtime
+                  in conn.execute("SELECT path, size, mtime FROM loaded_files").fetchall()}
+        rebuild = rebuild or any(current.get(path) != state for path, state in loaded.items())
+        if rebuild:
+            loaded = {}
+        new_files = [path for path in current if path not in loaded]
+        new_transactions = [path for path in new_files if path not in (CUSTOMERS_FILE, PRODUCTS_FILE)]
+
+        conn.begin()
+        if rebuild:
+            for table in ROLLUP_TABLES + ["loaded_files"]:
+                conn.execute(f"DELETE FROM {table}")
+        new_rows = 0
+        if new_transactions:
+            # Views can't take parameters, so the columns MERGE_SQL reads are loaded
+            # into a temp table, which also saves reading the files once per rollup
+            conn.execute("""
+                CREATE OR REPLACE TEMP TABLE new_transactions AS
+                SELECT transaction_date, customer_id, product_id, total_amount
+                FROM read_parquet($files)
+            """, {"files": new_transactions})
+            new_rows = conn.execute("SELECT COUNT(*) FROM new_transactions").fetchone()[0]
+            conn.execute(MERGE_SQL)
+            conn.execute("DROP TABLE new_transactions")
+        if new_files:
+            conn.executemany("INSERT INTO loaded_files VALUES (?, ?, ?)",
+                             [(path, *current[path]) for path in new_files])
+        conn.commit()
+    finally:
+        conn.close()
+
+    return {
+        "rebuilt": rebuild,
+        "new_files": len(new_transactions),
+        "new_rows": new_rows,
+        "seconds": time.perf_counter() - start,
+    }
+
+def attach(conn, db_path=ROLLUP_DB):
+    """Attach the rollup store read-only as `rollups` on a connection (or the duckdb module)."""
+    conn.execute(f"ATTACH IF NOT EXISTS '{db_path}' AS rollups (READ_ONLY)")
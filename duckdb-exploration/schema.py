@@ -0,0 +1,41 @@
+"""
+Shared definition of the low-cardinality columns in the generated data.
+
+Every column listed here takes one of a few fixed values. The generator draws
+them as small integer codes into these lists and writes them as dictionary-
+encoded Arrow/Parquet columns, and the views cast them to DuckDB ENUM types
+built from the same lists. ENUMs hash and compare as 1-byte codes instead of
+strings.
+"""
+
+# Values are listed alphabetically: ENUMs sort by declaration order, so this
+# keeps ORDER BY on an ENUM column identical to ORDER BY on the strings.
+ENUMS = {
+    "region": ["Central", "East", "North", "South", "West"],
+    "state": ["AZ", "CA", "FL", "GA", "IL", "IN", "MA", "MD", "MI", "MO",
+              "NC", "NJ", "NY", "OH", "PA", "TN", "TX", "VA", "WA", "WI"],
+    "loyalty_tier": ["Bronze", "Gold", "Platinum", "Silver"],
+    "category": ["Automotive", "Books", "Clothing", "Electronics", "Food & Beverages",
+                 "Health & Beauty", "Home & Garden", "Office", "Sports", "Toys"],
+    "payment_method": ["Bank Transfer", "Credit Card", "Debit Card", "PayPal"],
+    "channel": ["In-Store", "Mobile", "Web"],
+}
+
+def enum_type(column):
+    """Name of the DuckDB ENUM type for a column."""
+    return f"{column}_enum"
+
+def quote(value):
+    """SQL string literal."""
+    return "'" + value.replace("'", "''") + "'"
+
+def create_types_sql():
+    """CREATE TYPE statements for every ENUM column (safe to run more than once)."""
+    return "\n".join(
+        f"CREATE TYPE IF NOT EXISTS {enum_type(column)} AS ENUM ({', '.join(map(quote, values))});"
+        for column, values in ENUMS.items())
+
+def enum_select(columns):
+    """SELECT list that returns every column, with `columns` cast to their ENUM types."""
+    casts = ", ".join(f"{column}::{enum_type(column)} AS {column}" for column in columns)
+    return f"* REPLACE ({casts})"
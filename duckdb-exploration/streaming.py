@@ -0,0 +1,96 @@
+"""
+Stream query results as fixed-size Arrow record batches.
+
+`.df()` and `.to_arrow_table()` build the whole result in memory before
+returning. iter_batches() instead pulls `batch_size` rows at a time from
+DuckDB's streaming result, and the stages below are generators over those
+batches, so a pipeline holds about one batch at a time however large the
+result is. That lets consumers handle results bigger than RAM, e.g.:
+
+    batches = iter_batches(conn, "SELECT * FROM transactions")
+    batches = filter_batches(batches, pc.field("total_amount") > 500)
+    write_parquet(select_columns(batches, ["channel", "total_amount"]), "big.parquet")
+"""
+
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DEFAULT_BATCH_SIZE = 100_000
+
+def iter_batches(conn, sql, params=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Yield the results of `sql` as RecordBatches of at most `batch_size` rows."""
+    yield from conn.execute(sql, params).to_arrow_reader(batch_size)
+
+def filter_batches(batches, expression):
+    """Keep the rows matching a pyarrow compute expression; empty batches are dropped."""
+    for batch in batches:
+        batch = batch.filter(expression)
+        if batch.num_rows:
+            yield batch
+
+def select_columns(batches, columns):
+    """Keep only `columns`, in that order."""
+    for batch in batches:
+        yield batch.select(columns)
+
+def map_batches(batches, fn):
+    """Apply `fn` (RecordBatch -> RecordBatch) to every batch."""
+    for batch in batches:
+        yield fn(batch)
+
+def aggregate(batches, keys, aggregations):
+    """GROUP BY over a stream, one batch at a time.
+
+    `aggregations` are pyarrow (column, "sum"|"count"|"min"|"max") pairs, which
+    can be combined across batches by re-aggregating the partial results.
+    Returns a Table with one row per group.
+    """
+    combine = {"sum": "sum", "count": "sum", "min": "min", "max": "max"}
+    partial = None
+    for batch in batches:
+        table = pa.Table.from_batches([batch]).group_by(keys).aggregate(aggregations)
+        if partial is not None:
+            table = pa.concat_tables([partial, table]).group_by(keys).aggregate(
+                [(f"{column}_{fn}", combine[fn]) for column, fn in aggregations])
+            table = table.rename_columns(partial.column_names)
+        partial = table
+    return partial
+
+def write_parquet(batches, path):
+    """Write a stream of batches to one Parquet file; returns the number of rows written.
+
+    Nothing is written for an empty stream, since there is no schema to use.
+    """
+    rows = 0
+    writer = None
+    try:
+        for batch in batches:
+            if writer is None:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                writer = pq.ParquetWriter(path, batch.schema, compression="zstd")
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+class BatchStats:
+    """Pass-through stage counting rows and the largest batch held in memory."""
+
+    def __init__(self, batches):
+        self.batches = batches
+        self.num_batches = 0
+        self.rows = 0
+        self.total_bytes = 0
+        self.max_batch_bytes = 0
+
+    def __iter__(self):
+        for batch in self.batches:
+            self.num_batches += 1
+            self.rows += batch.num_rows
+            self.total_bytes += batch.nbytes
+            self.max_batch_bytes = max(self.max_batch_bytes, batch.nbytes)
+            yield batch